@@ -1,12 +1,32 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer
-from routes import auth, chats, analytics, reports
+from routes import auth, chats, analytics, reports, admin
+from utils.executor import process_pool
+from utils.startup import readiness, warm_up
+from services.purge import purge_worker
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serve immediately; connect and warm models in the background
+    warmup_task = asyncio.create_task(warm_up())
+    # Resumes any purge left unfinished by a previous run
+    purge_task = asyncio.create_task(purge_worker())
+    yield
+    warmup_task.cancel()
+    purge_task.cancel()
+    process_pool.shutdown()
+
 
 app = FastAPI(
     title="ChatInsight Backend",
     description="API for ChatInsight — Conversational & Meeting Analyzer",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 
@@ -29,6 +49,7 @@ app.include_router(auth.router)
 app.include_router(chats.router)
 app.include_router(analytics.router)
 app.include_router(reports.router)
+app.include_router(admin.router)
 
 
 
@@ -37,3 +58,6 @@ async def root():
     return {"message": "Welcome to ChatInsight API"}
 
 
+@app.get("/ready")
+async def ready():
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=readiness)
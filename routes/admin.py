@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from utils.auth_utils import get_current_user, user_cache
+from database import db
+from services.nlp import sentiment_cache
+from routes.analytics import analytics_cache
+import os
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"])
+
+# Comma-separated list of admin emails (set in .env)
+ADMIN_EMAILS = {e.strip() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+
+
+async def require_admin(curr_user: dict = Depends(get_current_user)):
+    if curr_user.get("email") not in ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return curr_user
+
+
+@router.get("/dedup")
+async def dedup_stats(admin: dict = Depends(require_admin)):
+    stats = await db.upload_stats.find_one({"_id": "dedup"}) or {}
+    return {
+        "duplicate_uploads": stats.get("duplicate_uploads", 0),
+        "bytes_saved": stats.get("bytes_saved", 0),
+        "documents_saved": stats.get("documents_saved", 0),
+    }
+
+
+@router.get("/cache")
+async def cache_stats(admin: dict = Depends(require_admin)):
+    """Hit/miss metrics of this process's in-memory caches."""
+    return {
+        "users": user_cache.stats(),
+        "sentiment": sentiment_cache.stats(),
+        "analytics": analytics_cache.stats(),
+    }
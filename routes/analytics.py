@@ -1,74 +1,238 @@
-from services.nlp import analyze_sentiment, keyword_extract, advanced_summary, extract_action_items
+from services.nlp import analyze_sentiments, format_keywords
+from services.activity import ActivityRollup, rollup
+from services.turns import chat_turn_taking
+from services.analytics import (
+    ANALYTICS_SHARD_SIZE, APPROX_SAMPLE_SIZE, AnalyticsAccumulator, ApproxAccumulator, accumulate_parallel,
+)
 from datetime import datetime
 from bson import ObjectId
 from utils.auth_utils import get_current_user
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from database import db
-from collections import Counter
+from pymongo import UpdateOne
+from utils.cache import LRUCache
+from utils.executor import process_pool, run_cpu
+from utils.mongo import iter_batches
+from services.message_store import DocumentStore, store_for
+import hashlib
+import os
 
 router = APIRouter(prefix="/api/analytics", tags=["Analytics"])
 
+# Sentiment backfill writes are sent in unordered bulk batches of this size
+BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "1000"))
+
+# In-process tier in front of the persisted analysis_reports documents
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "128"))
+analytics_cache = LRUCache(ANALYTICS_CACHE_SIZE)
+
+# Only these fields are streamed back to Python for the NLP stages
+NLP_FIELDS = ("sender", "text")
+
+
+async def backfill_sentiments(chat_id: ObjectId):
+    """Tags messages stored before ingest-time sentiment and writes them back in bulk."""
+    cursor = db.messages.find({"chat_id": chat_id, "sentiment": {"$exists": False}}, {"text": 1})
+    async for batch in iter_batches(cursor, BACKFILL_BATCH_SIZE):
+        labels = await process_pool.run(analyze_sentiments, [m["text"] for m in batch])
+        ops = [UpdateOne({"_id": m["_id"]}, {"$set": {"sentiment": label}}) for m, label in zip(batch, labels)]
+        await db.messages.bulk_write(ops, ordered=False)
+
+
+def chat_stats_pipeline(chat_id: ObjectId, store=DocumentStore()) -> list:
+    """Participant, sentiment and activity stats for one chat in a single round trip."""
+    dated = {"$match": {"timestamp": {"$type": "date"}}}
+    return store.message_stages(chat_id) + [
+        {"$facet": {
+            "participants": [
+                {"$group": {"_id": "$sender", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}},
+            ],
+            "sentiments": [
+                {"$group": {"_id": "$sentiment", "count": {"$sum": 1}}},
+            ],
+            "by_hour": [
+                dated,
+                {"$group": {"_id": {"$hour": "$timestamp"}, "count": {"$sum": 1}}},
+                {"$sort": {"_id": 1}},
+            ],
+            "by_day": [
+                dated,
+                {"$group": {
+                    "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+                    "count": {"$sum": 1},
+                }},
+                {"$sort": {"_id": 1}},
+            ],
+            "span": [
+                {"$group": {
+                    "_id": None,
+                    "total": {"$sum": 1},
+                    "first_message": {"$min": "$timestamp"},
+                    "last_message": {"$max": "$timestamp"},
+                }},
+            ],
+        }},
+    ]
+
+
+async def chat_version(chat: dict) -> str:
+    """Content version of a chat: message count plus last-modified time."""
+    message_count = chat.get("message_count")
+    if message_count is None:
+        message_count = await store_for(chat).count(chat["_id"])
+    modified = chat.get("updated_at") or chat.get("created_at")
+    raw = f"{chat['_id']}:{message_count}:{modified.isoformat() if modified else ''}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def report_response(report_doc: dict) -> dict:
+    """Builds the analytics response from a stored report."""
+    return {
+        "participants": [{"_id": k, "count": v} for k, v in report_doc["speaker_stats"].items()],
+        "sentiments": [{"_id": k, "count": v} for k, v in report_doc["sentiment_stats"].items()],
+        "activity": report_doc.get("activity", {}),
+        "turn_taking": report_doc.get("turn_taking", {}),
+        "action_items": report_doc["action_items"],
+        "action_item_count": report_doc.get("action_item_count", len(report_doc["action_items"])),
+        "keywords": report_doc["top_keywords"],
+        "summary": report_doc["summary"],
+        "productivity_score": report_doc["productivity_score"]
+    }
+
+
+async def approx_analytics(chat: dict) -> dict:
+    """Keywords and sentiment estimated from APPROX_SAMPLE_SIZE random messages."""
+    store = store_for(chat)
+    population = chat.get("message_count")
+    if population is None:
+        population = await store.count(chat["_id"])
+    sample = await store.sample(chat["_id"], population, APPROX_SAMPLE_SIZE, ("text",))
+    if not sample:
+        raise HTTPException(status_code=404, detail="No messages for this chat")
+
+    acc = ApproxAccumulator()
+    await run_cpu(acc.add_many, sample)
+    labels = await process_pool.run(analyze_sentiments, acc.texts)
+    return acc.report(labels, max(population, acc.message_count))
+
+
+@router.get("/{chat_id}/activity")
+async def get_chat_activity(chat_id: str, curr_user: dict = Depends(get_current_user)):
+    """Hour-of-day, weekday, per-day timeline and per-participant heatmaps."""
+    chat = await db.chats.find_one({"_id": ObjectId(chat_id), "uploaded_by": curr_user["email"], "deleted_at": None})
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found or unauthorized")
+
+    # Rollups are maintained at ingest; chats uploaded earlier get theirs built once
+    if chat.get("activity"):
+        activity = ActivityRollup.from_doc(chat["activity"])
+    else:
+        activity = ActivityRollup()
+        async for batch in store_for(chat).iter_batches(chat["_id"], ("sender", "timestamp"), BACKFILL_BATCH_SIZE):
+            activity.merge(await run_cpu(rollup, batch))
+        await db.chats.update_one({"_id": chat["_id"]}, {"$set": {"activity": activity.to_doc()}})
+    return activity.report()
+
+
 @router.get("/{chat_id}")
-async def get_chat_analytics(chat_id: str, curr_user: dict = Depends(get_current_user)):
-    chat = db.chats.find_one({"_id": ObjectId(chat_id), "uploaded_by": curr_user["email"]})
+async def get_chat_analytics(chat_id: str, request: Request, response: Response,
+                             mode: str = "exact", curr_user: dict = Depends(get_current_user)):
+    if mode not in ("exact", "approx"):
+        raise HTTPException(status_code=400, detail="mode must be 'exact' or 'approx'")
+
+    chat = await db.chats.find_one({"_id": ObjectId(chat_id), "uploaded_by": curr_user["email"], "deleted_at": None})
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found or unauthorized")
 
-    messages = list(db.messages.find({"chat_id": ObjectId(chat_id)}))
-    if not messages:
-        raise HTTPException(status_code=404, detail="No messages for this chat")
+    # Serve the current version from cache; recompute only when the chat changed
+    version = await chat_version(chat)
+    etag = f'"{version}"' if mode == "exact" else f'"{version}-{mode}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    if mode == "approx":
+        cache_key = (chat_id, version, mode)
+        cached = analytics_cache.get(cache_key)
+        if cached is None:
+            cached = await approx_analytics(chat)
+            analytics_cache.set(cache_key, cached)
+        return cached
+
+    cache_key = (chat_id, version)
+    cached = analytics_cache.get(cache_key)
+    if cached is None:
+        report_doc = await db.analysis_reports.find_one({"chat_id": ObjectId(chat_id), "version": version})
+        if report_doc:
+            cached = report_response(report_doc)
+            analytics_cache.set(cache_key, cached)
+    if cached is not None:
+        return cached
+
+    store = store_for(chat)
 
-    # Tag sentiments if not done
-    for msg in messages:
-        if "sentiment" not in msg:
-            msg["sentiment"] = analyze_sentiment(msg["text"])
-            db.messages.update_one({"_id": msg["_id"]}, {"$set": {"sentiment": msg["sentiment"]}})
+    # Tag sentiments for chats uploaded before ingest-time scoring (buckets always carry them)
+    if store.layout == "documents":
+        await backfill_sentiments(ObjectId(chat_id))
 
     # Aggregations
-    participant_stats = list(
-        db.messages.aggregate([
-            {"$match": {"chat_id": ObjectId(chat_id)}},
-            {"$group": {"_id": "$sender", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}}
-        ])
-    )
-    sentiment_stats = list(
-        db.messages.aggregate([
-            {"$match": {"chat_id": ObjectId(chat_id)}},
-            {"$group": {"_id": "$sentiment", "count": {"$sum": 1}}}
-        ])
-    )
+    pipeline = chat_stats_pipeline(ObjectId(chat_id), store)
+    cursor = await store.collection.aggregate(pipeline)
+    stats = (await cursor.to_list(length=1))[0]
+    if not stats["span"]:
+        raise HTTPException(status_code=404, detail="No messages for this chat")
+
+    participant_stats = stats["participants"]
+    sentiment_stats = stats["sentiments"]
+    span = stats["span"][0]
 
     sentiment_map = {s["_id"]: s["count"] for s in sentiment_stats}
     total_msgs = sum(sentiment_map.values())
     positive_ratio = sentiment_map.get("positive", 0) / total_msgs if total_msgs else 0
     productivity_score = round(50 + positive_ratio * 50, 2)
 
-    # New NLP Features
-    all_texts = [m["text"] for m in messages if m["text"].strip()]
-    top_keywords = keyword_extract(all_texts)
-    summary = advanced_summary(all_texts)
-    action_items = extract_action_items(messages)
+    # New NLP Features: use the partial aggregates maintained at ingest, or
+    # build them once (shards of the projected texts map-reduced in worker processes)
+    if chat.get("aggregates"):
+        acc = AnalyticsAccumulator.from_doc(chat["aggregates"])
+    else:
+        batches = store.iter_batches(ObjectId(chat_id), NLP_FIELDS, ANALYTICS_SHARD_SIZE)
+        acc = await accumulate_parallel(batches, process_pool)
+        await db.chats.update_one({"_id": chat["_id"]}, {"$set": {"aggregates": acc.to_doc()}})
+    top_keywords = format_keywords(acc.keywords)
+    summary = acc.summary()
+    action_items = list(acc.action_items)
+
+    by_hour = [0] * 24
+    for h in stats["by_hour"]:
+        by_hour[h["_id"]] = h["count"]
+    activity = {
+        "by_hour": by_hour,
+        "by_day": {d["_id"]: d["count"] for d in stats["by_day"]},
+        "first_message": span["first_message"],
+        "last_message": span["last_message"],
+    }
+
     # Save Report
     report_doc = {
         "chat_id": ObjectId(chat_id),
         "uploaded_by": curr_user["email"],
         "summary": summary,
         "action_items": action_items,
+        "action_item_count": acc.action_item_count,
         "top_keywords": top_keywords,
         "speaker_stats": {p["_id"]: p["count"] for p in participant_stats},
         "sentiment_stats": sentiment_map,
         "productivity_score": productivity_score,
+        "activity": activity,
+        "turn_taking": await chat_turn_taking(chat),
+        "version": version,
         "created_on": datetime.utcnow()
     }
 
-    db.analysis_reports.insert_one(report_doc)
+    await db.analysis_reports.insert_one(report_doc)
 
-    return {
-        "participants": participant_stats,
-        "sentiments": sentiment_stats,
-        "action_items": action_items,
-        "keywords": top_keywords,
-        "summary": summary,
-        "productivity_score": productivity_score
-    }
+    result = report_response(report_doc)
+    analytics_cache.set(cache_key, result)
+    return result
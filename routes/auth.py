@@ -2,12 +2,13 @@ from fastapi import APIRouter, HTTPException, Depends, Body, status
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import datetime, timedelta
 from bson import ObjectId
-import bcrypt
+from utils.passwords import hash_password, verify_password
 from utils.mongo import fix_mongo
 from models.user import UserCreate, UserLogin
 from database import users_collection
-from utils.auth_utils import create_access_token, create_refresh_token, get_current_user
+from utils.auth_utils import create_access_token, create_refresh_token, get_current_user, invalidate_user
 from database import db
+from services.purge import tombstone_chats
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
@@ -25,16 +26,11 @@ async def password_strength(password: str) -> bool:
     return True
 
 
-async def hash_password(password: str) -> str:
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode("utf-8"), salt).decode("utf-8")
-
-
 # -------------------- Register --------------------
 @router.post("/register")
 async def register(user: UserCreate):
     """Register new user with hashed password."""
-    if users_collection.find_one({"email": user.email}):
+    if await users_collection.find_one({"email": user.email}):
         raise HTTPException(status_code=400, detail="Email already registered")
 
     if not await password_strength(user.password):
@@ -54,7 +50,7 @@ async def register(user: UserCreate):
         "updated_at": datetime.utcnow(),
     }
 
-    users_collection.insert_one(user_dict)
+    await users_collection.insert_one(user_dict)
     return {"message": "User registered successfully"}
 
 
@@ -62,13 +58,11 @@ async def register(user: UserCreate):
 @router.post("/login")
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     """Login user using OAuth2PasswordRequestForm (username=email)."""
-    user_dict = users_collection.find_one({"email": form_data.username})
+    user_dict = await users_collection.find_one({"email": form_data.username})
     if not user_dict:
         raise HTTPException(status_code=400, detail="Invalid email or password")
 
-    if not bcrypt.checkpw(
-        form_data.password.encode("utf-8"), user_dict["hashed_password"].encode("utf-8")
-    ):
+    if not await verify_password(form_data.password, user_dict["hashed_password"]):
         raise HTTPException(status_code=400, detail="Invalid email or password")
 
     access_token_expires = timedelta(minutes=30)
@@ -80,9 +74,10 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
         data={"sub": user_dict["email"]}, expires_delta=refresh_token_expires
     )
 
-    users_collection.update_one(
+    await users_collection.update_one(
         {"email": user_dict["email"]}, {"$set": {"refresh_token": refresh_token}}
     )
+    invalidate_user(user_dict["email"])
 
     return {
         "access_token": access_token,
@@ -112,7 +107,7 @@ async def refresh_token(refresh_token: str = Body(...)):
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired refresh token")
 
-    user = users_collection.find_one({"email": email, "refresh_token": refresh_token})
+    user = await users_collection.find_one({"email": email, "refresh_token": refresh_token})
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
 
@@ -121,9 +116,10 @@ async def refresh_token(refresh_token: str = Body(...)):
     refresh_token_expires = timedelta(days=7)
     new_refresh_token = create_refresh_token(data={"sub": email}, expires_delta=refresh_token_expires)
 
-    users_collection.update_one(
+    await users_collection.update_one(
         {"email": email}, {"$set": {"refresh_token": new_refresh_token}}
     )
+    invalidate_user(email)
 
     return {
         "access_token": new_access_token,
@@ -139,21 +135,18 @@ async def logout(curr_user: dict = Depends(get_current_user)):
     email = curr_user["email"]
 
     # 1️⃣ Remove refresh token (your original behavior)
-    users_collection.update_one(
+    await users_collection.update_one(
         {"email": email},
         {"$unset": {"refresh_token": ""}}
     )
+    invalidate_user(email)
 
     # 2️⃣ Find all chats uploaded by the user
-    chats = list(db.chats.find({"uploaded_by": email}, {"_id": 1}))
+    chats = await db.chats.find({"uploaded_by": email, "deleted_at": None}, {"_id": 1}).to_list(length=None)
     chat_ids = [c["_id"] for c in chats]
 
-    # 3️⃣ Delete messages belonging to these chats
-    if chat_ids:
-        db.messages.delete_many({"chat_id": {"$in": chat_ids}})
-
-    # 4️⃣ Delete the chats themselves
-        db.chats.delete_many({"_id": {"$in": chat_ids}})
+    # 3️⃣ Tombstone the chats; messages and reports are purged in the background
+    await tombstone_chats(chat_ids)
 
     return {
         "message": "Logged out successfully. All chats and messages were deleted."
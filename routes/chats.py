@@ -1,63 +1,250 @@
 from fastapi import APIRouter, File, UploadFile, HTTPException, Depends
+from typing import Optional
 from utils.auth_utils import get_current_user
-from services.parser import parse_whatsapp_chat
+from services.parser import iter_lines, iter_whatsapp_messages, hash_stream
+from services.nlp import analyze_sentiment
+from services.analytics import AnalyticsAccumulator, accumulate
+from services.activity import ActivityRollup, rollup
+from services.message_store import default_store, store_for
+from services.purge import tombstone_chats
+from services.search import SEARCH_PAGE_SIZE, index_messages, remove_postings, search_messages
 from database import db
+from utils.executor import run_cpu
 from datetime import datetime
 from bson import ObjectId
+import hashlib
+import os
 
 router = APIRouter(prefix="/api/chats", tags=["Chats"])
 
-@router.post("/upload")
-async def upload_chat(file: UploadFile = File(...), curr_user: dict = Depends(get_current_user)):
-    # Read file once
-    raw_bytes = await file.read()
+# Messages are flushed to Mongo in batches of this size while parsing
+INSERT_BATCH_SIZE = int(os.getenv("INSERT_BATCH_SIZE", "1000"))
+
+
+def _message_batches(stream):
+    """Parses the upload, yielding INSERT_BATCH_SIZE batches."""
+    batch = []
+    for msg in iter_whatsapp_messages(iter_lines(stream)):
+        batch.append(msg)
+        if len(batch) >= INSERT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _tag_sentiments(batch: list) -> list:
+    for msg in batch:
+        msg["sentiment"] = analyze_sentiment(msg["text"])
+    return batch
 
-    # Decode safely
-    content_text = raw_bytes.decode("utf-8", errors="ignore").replace("\r", "")
-    lines = content_text.split("\n")
 
-    # 🔍 Debug print first 10 lines
-    print("\n📄--- File Preview ---")
-    for line in lines[:10]:
-        print(line)
-    print("📄--- End Preview ---\n")
+def _message_key(msg: dict) -> str:
+    """Fingerprint of a message, used to recognise re-exports of the same chat."""
+    ts = msg["timestamp"].isoformat() if msg["timestamp"] else ""
+    return hashlib.sha1(f"{ts}|{msg['sender']}|{msg['text']}".encode("utf-8")).hexdigest()
 
-    # Normalize en-dash and em-dash to hyphen for regex
-    lines = [line.replace("–", "-").replace("—", "-") for line in lines]
 
-    messages = parse_whatsapp_chat(lines)
+def _extends(chat: dict, stored_last: dict) -> bool:
+    """Whether the message at the stored chat's last position is its stored last message."""
+    if chat.get("last_key"):
+        return _message_key(stored_last) == chat["last_key"]
+    # Chats stored before last_key was recorded: compare the last timestamp
+    return stored_last["timestamp"] == chat.get("end_time")
+
+
+async def _discard_appended(store, chat_id, from_seq: int):
+    """Rolls back the messages and postings of a failed incremental upload."""
+    await store.truncate(chat_id, from_seq)
+    await remove_postings(chat_id, from_seq)
+
+
+@router.post("/upload")
+async def upload_chat(file: UploadFile = File(...), incremental: bool = False,
+                      curr_user: dict = Depends(get_current_user)):
+    # Identical re-upload: return the stored chat without parsing anything
+    await file.seek(0)
+    content_hash, size_bytes = await run_cpu(hash_stream, file.file)
+    duplicate = await db.chats.find_one(
+        {"uploaded_by": curr_user["email"], "content_hash": content_hash, "deleted_at": None}
+    )
+    if duplicate:
+        await db.upload_stats.update_one(
+            {"_id": "dedup"},
+            {"$inc": {
+                "duplicate_uploads": 1,
+                "bytes_saved": size_bytes,
+                "documents_saved": duplicate.get("message_count", 0) + 1,
+            }},
+            upsert=True,
+        )
+        return {
+            "chat_id": str(duplicate["_id"]),
+            "participants": duplicate["participants"],
+            "message_count": duplicate.get("message_count", 0),
+            "message": "Identical chat already uploaded",
+        }
 
-    if not messages:
+    # Stream the spooled upload: chunked read → lines → messages → batched inserts.
+    # Parsing and scoring run on the CPU executor one batch at a time; only
+    # messages that are actually stored get scored.
+    await file.seek(0)
+    batches = _message_batches(file.file)
+    batch = await run_cpu(next, batches, None)
+    if batch is None:
         raise HTTPException(status_code=400, detail="No valid messages found in file")
+    prefix_key = _message_key(batch[0])
 
-    chat_doc = {
-        "title": file.filename,
-        "source": "whatsapp",
-        "uploaded_by": curr_user["email"],
-        "participants": list(set([m["sender"] for m in messages])),
-        "start_time": messages[0]["timestamp"],
-        "end_time": messages[-1]["timestamp"],
-        "created_at": datetime.utcnow(),
-    }
-    chat_id = db.chats.insert_one(chat_doc).inserted_id
+    # Incremental mode: a re-export of a stored chat (same title, same first
+    # message) only appends the messages after the ones already stored. The
+    # last skipped message must be the stored last message, otherwise the
+    # export does not extend the stored chat (e.g. messages were deleted).
+    chat = None
+    if incremental:
+        chat = await db.chats.find_one(
+            {"uploaded_by": curr_user["email"], "title": file.filename, "prefix_key": prefix_key,
+             "deleted_at": None},
+            sort=[("created_at", -1)],
+        )
+    chat_id = chat["_id"] if chat else ObjectId()
+    store = store_for(chat) if chat else default_store()
+    skip = stored_count = chat.get("message_count", 0) if chat else 0
+
+    participants = set()
+    start_time = end_time = None
+    last_key = None
+    message_count = 0
+    delta = AnalyticsAccumulator()
+    activity = ActivityRollup()
+
+    # A new chat is registered before any message is written, so a failed
+    # upload leaves a tombstone the purge worker cleans up, not orphaned rows
+    if not chat:
+        now = datetime.utcnow()
+        await db.chats.insert_one({
+            "_id": chat_id,
+            "title": file.filename,
+            "source": "whatsapp",
+            "uploaded_by": curr_user["email"],
+            "participants": [],
+            "message_count": 0,
+            "storage": store.layout,
+            "status": "uploading",
+            "created_at": now,
+            "updated_at": now,
+        })
+
+    try:
+        while batch is not None:
+            if skip:
+                skipped = min(skip, len(batch))
+                overlap_end = batch[skipped - 1]
+                batch, skip = batch[skipped:], skip - skipped
+                if not skip and not _extends(chat, overlap_end):
+                    raise HTTPException(
+                        status_code=409,
+                        detail="File does not extend the stored chat; upload it without incremental mode",
+                    )
+            if batch:
+                await run_cpu(_tag_sentiments, batch)
+                for msg in batch:
+                    participants.add(msg["sender"])
+                if message_count == 0:
+                    start_time = batch[0]["timestamp"]
+                end_time = batch[-1]["timestamp"]
+                last_key = _message_key(batch[-1])
+                first_seq = stored_count + message_count
+                for i, msg in enumerate(batch):
+                    msg["seq"] = first_seq + i
+                message_count += len(batch)
+                delta.merge(await run_cpu(accumulate, batch))
+                activity.merge(await run_cpu(rollup, batch))
+                await store.insert(chat_id, batch)
+                await index_messages(curr_user["email"], chat_id, batch, first_seq)
+            batch = await run_cpu(next, batches, None)
 
-    for msg in messages:
-        msg["chat_id"] = chat_id
-    db.messages.insert_many(messages)
+        if skip:
+            raise HTTPException(
+                status_code=409,
+                detail="File has fewer messages than the stored chat; upload it without incremental mode",
+            )
+
+        if chat:
+            if message_count:
+                update = {
+                    "$set": {
+                        "end_time": end_time,
+                        "last_key": last_key,
+                        "content_hash": content_hash,
+                        "size_bytes": size_bytes,
+                        "updated_at": datetime.utcnow(),
+                    },
+                    "$inc": {"message_count": message_count},
+                    "$addToSet": {"participants": {"$each": list(participants)}},
+                }
+                # Stored partial aggregates are updated by delta only
+                if chat.get("aggregates"):
+                    merged = AnalyticsAccumulator.from_doc(chat["aggregates"]).merge(delta)
+                    update["$set"]["aggregates"] = merged.to_doc()
+                if chat.get("activity"):
+                    merged = ActivityRollup.from_doc(chat["activity"]).merge(activity)
+                    update["$set"]["activity"] = merged.to_doc()
+                await db.chats.update_one({"_id": chat_id}, update)
+        else:
+            await db.chats.update_one({"_id": chat_id}, {"$set": {
+                "participants": list(participants),
+                "start_time": start_time,
+                "end_time": end_time,
+                "message_count": message_count,
+                "prefix_key": prefix_key,
+                "last_key": last_key,
+                "content_hash": content_hash,
+                "size_bytes": size_bytes,
+                "aggregates": delta.to_doc(),
+                "activity": activity.to_doc(),
+                "status": "ready",
+                "updated_at": datetime.utcnow(),
+            }})
+    except BaseException:
+        if chat:
+            await _discard_appended(store, chat_id, stored_count)
+        else:
+            await tombstone_chats([chat_id])
+        raise
+
+    if chat:
+        return {
+            "chat_id": str(chat_id),
+            "participants": sorted(set(chat["participants"]) | participants),
+            "message_count": stored_count + message_count,
+            "new_messages": message_count,
+            "message": "Chat updated with new messages" if message_count else "No new messages found",
+        }
 
     return {
         "chat_id": str(chat_id),
-        "participants": chat_doc["participants"],
-        "message_count": len(messages),
+        "participants": list(participants),
+        "message_count": message_count,
         "message": "Chat uploaded and parsed successfully",
     }
 
+@router.get("/search")
+async def search_chats(q: str, sender: Optional[str] = None, limit: int = SEARCH_PAGE_SIZE,
+                       cursor: Optional[str] = None, curr_user: dict = Depends(get_current_user)):
+    """
+    Ranked search over the user's messages. Quoted parts of q must match as
+    phrases; pass the returned next_cursor to get the following page.
+    """
+    return await search_messages(curr_user["email"], q, sender=sender, limit=limit, cursor=cursor)
+
+
 @router.delete("/{chat_id}")
 async def delete_chat(chat_id: str, curr_user: dict = Depends(get_current_user)):
-    chat = db.chats.find_one({"_id": ObjectId(chat_id), "uploaded_by": curr_user["email"]})
+    chat = await db.chats.find_one({"_id": ObjectId(chat_id), "uploaded_by": curr_user["email"], "deleted_at": None})
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found or unauthorized")
 
-    db.messages.delete_many({"chat_id": ObjectId(chat_id)})
-    db.chats.delete_one({"_id": ObjectId(chat_id)})
+    # Hidden (and out of search results) immediately; messages, reports and
+    # search postings are purged in the background
+    await tombstone_chats([ObjectId(chat_id)])
     return {"message": f"Chat {chat_id} deleted successfully"}
@@ -1,10 +1,20 @@
-from fastapi import APIRouter, HTTPException, Response, Depends
+from fastapi import APIRouter, HTTPException, Response, Request, Depends
+from fastapi.responses import StreamingResponse
 from database import db
 from utils.auth_utils import get_current_user
 from bson import ObjectId
 from bson.errors import InvalidId
-from services.report_gen import generate_pdf, generate_csv
+from services.csv_export import MESSAGE_CSV_FIELDS, message_csv_header, message_csv_rows
+from services.artifacts import (
+    MEDIA_TYPES, artifact_path, build_artifact, iter_file, parse_range, report_fingerprint
+)
+from utils.executor import process_pool
+from services.analytics import ANALYTICS_SHARD_SIZE, AnalyticsAccumulator, accumulate_parallel
+from services.turns import chat_turn_taking
+from services.purge import release_artifacts
+from services.message_store import store_for, READ_BATCH_SIZE
 from datetime import datetime
+import os
 router = APIRouter(prefix="/api/reports", tags=["Reports"])
 
 
@@ -17,17 +27,22 @@ async def generate_report(chat_id: str, curr_user: dict = Depends(get_current_us
     except InvalidId:
         raise HTTPException(status_code=400, detail="Invalid chat ID format")
 
-    chat = db.chats.find_one({"_id": chat_obj_id})
+    chat = await db.chats.find_one({"_id": chat_obj_id, "deleted_at": None})
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
 
-    messages = list(db.messages.find({"chat_id": chat_obj_id}))
-    if not messages:
+    # Reuse the partial aggregates maintained at ingest, or build them once
+    # (shards accumulated in parallel worker processes)
+    if chat.get("aggregates"):
+        acc = AnalyticsAccumulator.from_doc(chat["aggregates"])
+    else:
+        batches = store_for(chat).iter_batches(chat_obj_id, ("sender", "text"), ANALYTICS_SHARD_SIZE)
+        acc = await accumulate_parallel(batches, process_pool)
+        if acc.message_count:
+            await db.chats.update_one({"_id": chat_obj_id}, {"$set": {"aggregates": acc.to_doc()}})
+    if not acc.message_count:
         raise HTTPException(status_code=404, detail="No messages for this chat")
-
-    # Run analytics pipeline
-    from services.analytics import compute_analytics
-    analytics_data = compute_analytics(messages)
+    analytics_data = acc.report()
 
     summary_text = (
         f"This chat has {analytics_data['message_count']} messages. "
@@ -40,10 +55,11 @@ async def generate_report(chat_id: str, curr_user: dict = Depends(get_current_us
         "productivity_score": analytics_data.get("productivity_score", 85),
         "top_keywords": analytics_data.get("top_keywords", []),
         "speaker_stats": analytics_data.get("speaker_stats", {}),
+        "turn_taking": await chat_turn_taking(chat),
         "created_on": datetime.utcnow()
     }
 
-    result = db.analysis_reports.insert_one(report_doc)
+    result = await db.analysis_reports.insert_one(report_doc)
 
     return {
         "report_id": str(result.inserted_id),
@@ -52,9 +68,30 @@ async def generate_report(chat_id: str, curr_user: dict = Depends(get_current_us
     }
 
 
+@router.get("/{chat_id}/messages")
+async def export_messages(chat_id: str, curr_user: dict = Depends(get_current_user)):
+    """Streams every message of a chat as CSV, one cursor batch at a time."""
+    try:
+        chat_obj_id = ObjectId(chat_id)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="Invalid chat ID format")
+
+    chat = await db.chats.find_one({"_id": chat_obj_id, "uploaded_by": curr_user["email"], "deleted_at": None})
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found or unauthorized")
+
+    async def rows():
+        yield message_csv_header()
+        async for batch in store_for(chat).iter_batches(chat_obj_id, MESSAGE_CSV_FIELDS, READ_BATCH_SIZE):
+            yield message_csv_rows(batch)
+
+    headers = {"Content-Disposition": f"attachment; filename=chat_messages_{chat_id}.csv"}
+    return StreamingResponse(rows(), media_type="text/csv", headers=headers)
+
+
 @router.get("/{report_id}")
 async def get_report(report_id: str, curr_user: dict = Depends(get_current_user)):
-    report_doc = db.analysis_reports.find_one({"_id": ObjectId(report_id)})
+    report_doc = await db.analysis_reports.find_one({"_id": ObjectId(report_id), "deleted_at": None})
     if not report_doc:
         raise HTTPException(status_code=404, detail="Report not found")
 
@@ -65,31 +102,71 @@ async def get_report(report_id: str, curr_user: dict = Depends(get_current_user)
 
 
 @router.get("/{report_id}/download")
-async def download_report(report_id: str, format: str = "pdf", curr_user: dict = Depends(get_current_user)):
+async def download_report(report_id: str, request: Request, format: str = "pdf",
+                          curr_user: dict = Depends(get_current_user)):
     from bson.errors import InvalidId
 
+    if format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid format. Use ?format=pdf or ?format=csv.")
+
     try:
-        report_doc = db.analysis_reports.find_one({"_id": ObjectId(report_id)})
+        report_doc = await db.analysis_reports.find_one({"_id": ObjectId(report_id), "deleted_at": None})
     except InvalidId:
         raise HTTPException(status_code=400, detail="Invalid report ID format")
 
     if not report_doc:
         raise HTTPException(status_code=404, detail="Report not found")
 
-    # Convert ObjectIds to strings
-    report_doc["_id"] = str(report_doc["_id"])
-    if isinstance(report_doc.get("chat_id"), ObjectId):
-        report_doc["chat_id"] = str(report_doc["chat_id"])
-
-    # Generate PDF or CSV
-    if format == "pdf":
-        pdf_bytes = generate_pdf(report_doc)
-        headers = {"Content-Disposition": f"attachment; filename=chat_report_{report_id}.pdf"}
-        return Response(content=pdf_bytes.getvalue(), media_type="application/pdf", headers=headers)
-
-    elif format == "csv":
-        csv_bytes = generate_csv(report_doc)
-        headers = {"Content-Disposition": f"attachment; filename=chat_report_{report_id}.csv"}
-        return Response(content=csv_bytes.getvalue(), media_type="text/csv", headers=headers)
-
-    raise HTTPException(status_code=400, detail="Invalid format. Use ?format=pdf or ?format=csv.")
+    # Reuse the stored artifact unless the report content changed since it was rendered
+    fingerprint = report_fingerprint(report_doc)
+    artifact = report_doc.get("artifacts", {}).get(format)
+    if not artifact or artifact.get("source") != fingerprint or \
+            not os.path.exists(artifact_path(artifact["digest"], format)):
+        # Convert ObjectIds to strings
+        render_doc = {k: v for k, v in report_doc.items() if k != "artifacts"}
+        render_doc["_id"] = str(render_doc["_id"])
+        if isinstance(render_doc.get("chat_id"), ObjectId):
+            render_doc["chat_id"] = str(render_doc["chat_id"])
+
+        previous = artifact
+        artifact = await process_pool.run(build_artifact, render_doc, format)
+        artifact["source"] = fingerprint
+        await db.analysis_reports.update_one(
+            {"_id": report_doc["_id"]}, {"$set": {f"artifacts.{format}": artifact}}
+        )
+        # The superseded rendering is dropped unless another report uses it
+        if previous and previous["digest"] != artifact["digest"]:
+            await release_artifacts({(format, previous["digest"])})
+
+    etag = f'"{artifact["digest"]}"'
+    size = artifact["size"]
+    headers = {
+        "Content-Disposition": f"attachment; filename=chat_report_{report_id}.{format}",
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    # Stream the file from disk, honouring a single byte range
+    status_code = 200
+    start, end = 0, size - 1
+    range_header = request.headers.get("range")
+    if range_header and request.headers.get("if-range", etag) == etag:
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            raise HTTPException(status_code=416, detail="Requested range not satisfiable",
+                                headers={"Content-Range": f"bytes */{size}"})
+        if byte_range:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iter_file(artifact_path(artifact["digest"], format), start, end),
+        status_code=status_code,
+        media_type=MEDIA_TYPES[format],
+        headers=headers,
+    )
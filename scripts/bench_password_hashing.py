@@ -0,0 +1,82 @@
+"""
+Login-burst benchmark: bcrypt inline vs. the bounded hashing executor.
+
+Fires CONCURRENT password verifications while a probe coroutine stands in
+for an unrelated cheap endpoint (it sleeps 5 ms and records how late it
+wakes up). Reports login throughput, rejected (503) logins and the probe's
+p50 / p99 latency.
+
+    python -m scripts.bench_password_hashing [concurrent_logins]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+import bcrypt
+from fastapi import HTTPException
+
+from utils.passwords import BCRYPT_ROUNDS, verify_password
+
+PASSWORD = "Benchmark123"
+PROBE_INTERVAL = 0.005
+
+
+async def probe(latencies: list, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        latencies.append(time.perf_counter() - started)
+
+
+async def inline_verify(password: str, hashed: str) -> bool:
+    # What the handlers did before: blocks the event loop for the whole hash
+    return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+
+
+async def run(verify, hashed: str, concurrent: int):
+    latencies, stop = [], asyncio.Event()
+    probe_task = asyncio.create_task(probe(latencies, stop))
+    await asyncio.sleep(PROBE_INTERVAL * 2)
+
+    rejected = 0
+
+    async def login():
+        nonlocal rejected
+        try:
+            await verify(PASSWORD, hashed)
+        except HTTPException:
+            rejected += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(concurrent)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return {
+        "logins_per_s": (concurrent - rejected) / elapsed,
+        "rejected": rejected,
+        "probe_p50_ms": statistics.median(latencies) * 1000,
+        "probe_p99_ms": p99 * 1000,
+    }
+
+
+async def main(argv) -> int:
+    concurrent = int(argv[0]) if argv else 20
+    hashed = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode("utf-8")
+
+    print(f"{concurrent} concurrent logins, bcrypt cost {BCRYPT_ROUNDS}")
+    for name, verify in (("inline", inline_verify), ("executor", verify_password)):
+        r = await run(verify, hashed, concurrent)
+        print(
+            f"{name:>9}: {r['logins_per_s']:6.1f} logins/s  rejected={r['rejected']:<3}"
+            f" probe p50={r['probe_p50_ms']:7.1f} ms  p99={r['probe_p99_ms']:7.1f} ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
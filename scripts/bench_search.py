@@ -0,0 +1,110 @@
+"""
+Search latency vs. corpus size.
+
+Indexes synthetic chats for a throwaway user in growing steps and times
+search_messages() for a fixed query mix at each size (p50 / p95 over
+REPEATS runs), for the first page and for page DEEP_PAGE. Run against a disposable database:
+
+    MONGO_URL=mongodb://localhost:27017/chatinsight_bench python -m scripts.bench_search [10000 100000 ...]
+
+The user's chats, messages and postings are removed afterwards.
+"""
+import asyncio
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from bson import ObjectId
+
+from database import db
+from services.message_store import default_store
+from services.search import index_messages, search_messages
+from utils.indexes import ensure_indexes
+
+USER = "search-bench@example.com"
+CHAT_SIZE = 10_000
+BATCH_SIZE = 1000
+REPEATS = 20
+DEEP_PAGE = 10
+SIZES = [10_000, 100_000, 1_000_000]
+QUERIES = [
+    ("common term", "meeting", None),
+    ("two terms", "budget review", None),
+    ("phrase", '"launch delay"', None),
+    ("sender filter", "project", "Member 3"),
+]
+
+WORDS = (
+    "meeting deadline project great awful release budget design review happy "
+    "angry client launch delay thanks sorry update weekend coffee server"
+).split()
+VOCABULARY = WORDS + [f"topic{i:04d}" for i in range(5000)]
+
+
+async def add_chat(rnd: random.Random, messages: int):
+    store, chat_id = default_store(), ObjectId()
+    for first_seq in range(0, messages, BATCH_SIZE):
+        batch = [
+            {
+                "sender": f"Member {rnd.randrange(20)}",
+                "timestamp": datetime.utcnow(),
+                "text": " ".join(rnd.choice(VOCABULARY if rnd.random() < 0.3 else WORDS) for _ in range(8)),
+                "seq": first_seq + i,
+            }
+            for i in range(min(BATCH_SIZE, messages - first_seq))
+        ]
+        await store.insert(chat_id, batch)
+        await index_messages(USER, chat_id, batch, first_seq)
+    await db.chats.insert_one({
+        "_id": chat_id, "uploaded_by": USER, "title": "bench", "storage": store.layout,
+        "message_count": messages, "created_at": datetime.utcnow(),
+    })
+
+
+async def cleanup():
+    chat_ids = [c["_id"] async for c in db.chats.find({"uploaded_by": USER}, {"_id": 1})]
+    await default_store().collection.delete_many({"chat_id": {"$in": chat_ids}})
+    await db.search_postings.delete_many({"user": USER})
+    await db.chats.delete_many({"uploaded_by": USER})
+
+
+async def main(argv) -> int:
+    sizes = [int(a) for a in argv] or SIZES
+    await ensure_indexes(db)
+    await cleanup()
+    rnd = random.Random(11)
+
+    indexed = 0
+    try:
+        for size in sizes:
+            while indexed < size:
+                await add_chat(rnd, min(CHAT_SIZE, size - indexed))
+                indexed += min(CHAT_SIZE, size - indexed)
+
+            print(f"\n{indexed} messages")
+            for label, q, sender in QUERIES:
+                deep_cursor = None
+                for _ in range(DEEP_PAGE - 1):
+                    page = await search_messages(USER, q, sender=sender, cursor=deep_cursor)
+                    deep_cursor = page["next_cursor"]
+                    if not deep_cursor:
+                        break
+                pages = [("page 1", None)] + ([(f"page {DEEP_PAGE}", deep_cursor)] if deep_cursor else [])
+                for page_label, cursor in pages:
+                    timings = []
+                    for _ in range(REPEATS):
+                        started = time.perf_counter()
+                        await search_messages(USER, q, sender=sender, cursor=cursor)
+                        timings.append((time.perf_counter() - started) * 1000)
+                    timings.sort()
+                    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                    print(f"  {label:>14} {page_label:>7}: p50={statistics.median(timings):8.1f} ms  p95={p95:8.1f} ms")
+    finally:
+        await cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
@@ -0,0 +1,92 @@
+"""
+Sharded analytics benchmark: serial accumulate() vs. map-reduce over worker
+processes, for 1, 2, 4, ... workers up to the core count.
+
+Generates a synthetic chat, checks that every sharded report matches the
+serial one and prints wall time and speedup per worker count.
+
+    python -m scripts.bench_sharded_analytics [messages] [shard_size]
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+from services.analytics import ANALYTICS_SHARD_SIZE, accumulate, accumulate_parallel, shards
+from services.nlp import sentiment_cache
+from utils.executor import ProcessPool
+
+WORDS = (
+    "meeting deadline project great awful release budget design review happy "
+    "angry client launch delay thanks sorry update weekend coffee server bug"
+).split()
+TEMPLATES = [
+    "{0} {1} {2}",
+    "we need to finish the {0} before {1}",
+    "let's {0} the {1} {2} tomorrow",
+    "this {0} is {1}!!",
+    "<Media omitted>",
+    "ok",
+    "haha {0}",
+]
+SENDERS = [f"Member {i}" for i in range(40)]
+
+
+def synthetic_messages(n: int, seed: int = 7) -> list:
+    rnd = random.Random(seed)
+    return [
+        {
+            "sender": rnd.choice(SENDERS),
+            "text": rnd.choice(TEMPLATES).format(*rnd.sample(WORDS, 3)),
+        }
+        for _ in range(n)
+    ]
+
+
+def comparable(report: dict) -> dict:
+    return {k: v for k, v in report.items() if k != "generated_on"}
+
+
+async def sharded(messages: list, workers: int, shard_size: int):
+    pool = ProcessPool(workers=workers, timeout=3600)
+    try:
+        await pool.warmup()
+
+        async def batches():
+            for shard in shards(messages, shard_size):
+                yield shard
+
+        started = time.perf_counter()
+        report = (await accumulate_parallel(batches(), pool)).report()
+        return time.perf_counter() - started, report
+    finally:
+        pool.shutdown()
+
+
+async def main(argv) -> int:
+    n = int(argv[0]) if argv else 500_000
+    shard_size = int(argv[1]) if len(argv) > 1 else ANALYTICS_SHARD_SIZE
+    messages = synthetic_messages(n)
+
+    sentiment_cache.clear()  # workers start cold too
+    started = time.perf_counter()
+    expected = comparable(accumulate(messages).report())
+    serial = time.perf_counter() - started
+    print(f"{n} messages, shards of {shard_size}")
+    print(f"   serial: {serial:7.2f} s")
+
+    workers, cores = 1, os.cpu_count() or 1
+    failed = False
+    while workers <= cores:
+        elapsed, report = await sharded(messages, workers, shard_size)
+        same = comparable(report) == expected
+        failed |= not same
+        print(f"{workers:>3} proc: {elapsed:7.2f} s  speedup x{serial / elapsed:4.2f}"
+              f"  {'identical' if same else 'MISMATCH'}")
+        workers *= 2
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
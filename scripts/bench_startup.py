@@ -0,0 +1,53 @@
+"""
+Cold-start benchmark: import cost of the app, per module.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter and
+reports the wall time plus the most expensive modules (cumulative µs).
+
+    python -m scripts.bench_startup            # top 20 modules
+    python -m scripts.bench_startup 50         # top 50 modules
+"""
+import os
+import subprocess
+import sys
+import time
+
+TARGET = "main"
+
+
+def measure(target: str = TARGET):
+    env = dict(os.environ)
+    # database.py needs a URL; the Mongo client does not connect on import
+    env.setdefault("MONGO_URL", "mongodb://localhost:27017/chatinsight")
+
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr)
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return wall, modules
+
+
+def main(argv) -> int:
+    top = int(argv[0]) if argv else 20
+    wall, modules = measure()
+
+    print(f"import {TARGET}: {wall * 1000:.0f} ms wall (including interpreter start)")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative, self_us, name in sorted(modules, reverse=True)[:top]:
+        print(f"{cumulative / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
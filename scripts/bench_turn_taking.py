@@ -0,0 +1,84 @@
+"""
+Turn-taking benchmark on a synthetic chat.
+
+Builds sorted timestamp / sender-code arrays for N messages (default 1M),
+times the vectorized turn_taking() stage and checks it against a plain
+per-message Python loop on the same data.
+
+    python -m scripts.bench_turn_taking [messages] [participants]
+"""
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from services.turns import SESSION_GAP_MINUTES, turn_taking
+
+
+def synthetic_arrays(n: int, participants: int, seed: int = 5):
+    rng = np.random.default_rng(seed)
+    # Mostly short gaps with occasional long pauses that start new sessions
+    gaps = rng.exponential(90, n).astype(np.int64)
+    gaps[rng.random(n) < 0.01] += 6 * 3600
+    seconds = 1_600_000_000 + np.cumsum(gaps)
+    # Sticky speakers: a message keeps the previous sender 40% of the time
+    codes = rng.integers(0, participants, n)
+    keep = rng.random(n) < 0.4
+    keep[0] = False
+    idx = np.where(keep, 0, np.arange(n))
+    codes = codes[np.maximum.accumulate(idx)]
+    return seconds, codes, [f"Member {i}" for i in range(participants)]
+
+
+def reference(seconds, codes, names, gap_minutes):
+    """Straightforward per-message loop, used to validate the vectorized stage."""
+    latencies, transitions = defaultdict(list), Counter()
+    sessions, size = [], 1
+    seconds, codes = seconds.tolist(), codes.tolist()
+    for i in range(1, len(seconds)):
+        gap = seconds[i] - seconds[i - 1]
+        if gap > gap_minutes * 60:
+            sessions.append(size)
+            size = 1
+            continue
+        size += 1
+        if codes[i] != codes[i - 1]:
+            latencies[names[codes[i]]].append(gap)
+            transitions[(names[codes[i - 1]], names[codes[i]])] += 1
+    sessions.append(size)
+    return (
+        {p: statistics.median(v) for p, v in latencies.items()},
+        transitions,
+        len(sessions),
+    )
+
+
+def main(argv) -> int:
+    n = int(argv[0]) if argv else 1_000_000
+    participants = int(argv[1]) if len(argv) > 1 else 50
+    seconds, codes, names = synthetic_arrays(n, participants)
+
+    started = time.perf_counter()
+    result = turn_taking(seconds, codes, names, SESSION_GAP_MINUTES)
+    vectorized = time.perf_counter() - started
+
+    started = time.perf_counter()
+    medians, transitions, session_count = reference(seconds, codes, names, SESSION_GAP_MINUTES)
+    loop = time.perf_counter() - started
+
+    same = (
+        {r["participant"]: r["median_seconds"] for r in result["reply_latency"]} == medians
+        and all(transitions[(t["from"], t["to"])] == t["count"] for t in result["transitions"])
+        and result["sessions"]["count"] == session_count
+    )
+    print(f"{n} messages, {participants} participants, {result['sessions']['count']} sessions")
+    print(f"  vectorized: {vectorized * 1000:8.1f} ms")
+    print(f"  python loop: {loop * 1000:7.1f} ms  (x{loop / vectorized:.1f})")
+    print(f"  results {'identical' if same else 'MISMATCH'}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
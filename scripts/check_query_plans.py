@@ -0,0 +1,101 @@
+"""
+Query-plan regression check.
+
+Runs explain() on every query shape the routes issue and fails if any
+winning plan falls back to a COLLSCAN. Run from the repo root against a
+disposable database:
+
+    MONGO_URL=mongodb://localhost:27017/chatinsight_plans python -m scripts.check_query_plans
+"""
+import asyncio
+import sys
+from datetime import datetime
+from bson import ObjectId
+
+from database import db
+from utils.indexes import ensure_indexes
+from routes.analytics import chat_stats_pipeline
+from services.message_store import BucketStore
+from services.search import ranking_pipeline
+
+CHAT_ID = ObjectId()
+EMAIL = "plans@example.com"
+
+# (label, collection, filter) for find / count / update / delete shapes
+FIND_SHAPES = [
+    ("analytics: chat messages", "messages", {"chat_id": CHAT_ID}),
+    ("analytics: sentiment backfill", "messages", {"chat_id": CHAT_ID, "sentiment": {"$exists": False}}),
+    ("logout: cascade delete", "messages", {"chat_id": {"$in": [CHAT_ID]}}),
+    ("buckets: chat messages", "message_buckets", {"chat_id": CHAT_ID}),
+    ("buckets: cascade delete", "message_buckets", {"chat_id": {"$in": [CHAT_ID]}}),
+    ("chats: owner lookup", "chats", {"_id": CHAT_ID, "uploaded_by": EMAIL}),
+    ("logout: user chats", "chats", {"uploaded_by": EMAIL, "deleted_at": None}),
+    ("purge: next tombstone", "chats", {"deleted_at": {"$type": "date"}}),
+    ("purge: stale uploads", "chats", {"status": "uploading", "updated_at": {"$lt": datetime.utcnow()}}),
+    ("search: postings", "search_postings",
+     {"user": EMAIL, "term": {"$in": ["term"]}, "chat_id": {"$in": [CHAT_ID]}}),
+    ("search: purge postings", "search_postings", {"chat_id": CHAT_ID}),
+    ("search: messages by seq", "messages", {"chat_id": CHAT_ID, "seq": {"$in": [0, 1]}}),
+    ("search: bucket by seq", "message_buckets", {"chat_id": CHAT_ID, "first_seq": {"$lte": 0}}),
+    ("upload: duplicate check", "chats", {"uploaded_by": EMAIL, "content_hash": "digest"}),
+    ("auth: user by email", "users", {"email": EMAIL}),
+    ("auth: refresh token", "users", {"email": EMAIL, "refresh_token": "token"}),
+    ("analytics: cached report", "analysis_reports", {"chat_id": CHAT_ID, "version": "v"}),
+    ("purge: artifact references", "analysis_reports", {"artifacts.pdf.digest": "digest"}),
+]
+
+# (label, collection, pipeline) for aggregate shapes
+AGGREGATE_SHAPES = [
+    ("analytics: stats facet", "messages", chat_stats_pipeline(CHAT_ID)),
+    ("buckets: stats facet", "message_buckets", chat_stats_pipeline(CHAT_ID, BucketStore())),
+    ("search: ranking page", "search_postings",
+     ranking_pipeline(EMAIL, [CHAT_ID], {"term": 1.0}, (1.0, CHAT_ID, 0), 21)),
+]
+
+
+def winning_plans(explain):
+    """Yields every winningPlan subtree of an explain document."""
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == "winningPlan":
+                yield value
+            else:
+                yield from winning_plans(value)
+    elif isinstance(explain, list):
+        for item in explain:
+            yield from winning_plans(item)
+
+
+def has_collscan(plan) -> bool:
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(has_collscan(v) for v in plan.values())
+    if isinstance(plan, list):
+        return any(has_collscan(v) for v in plan)
+    return False
+
+
+async def main() -> int:
+    await ensure_indexes(db)
+    failures = []
+
+    for label, collection, query in FIND_SHAPES:
+        explain = await db[collection].find(query).explain()
+        if any(has_collscan(p) for p in winning_plans(explain)):
+            failures.append(label)
+
+    for label, collection, pipeline in AGGREGATE_SHAPES:
+        explain = await db.command("aggregate", collection, pipeline=pipeline, explain=True)
+        if any(has_collscan(p) for p in winning_plans(explain)):
+            failures.append(label)
+
+    for label in failures:
+        print(f"❌ COLLSCAN: {label}")
+    if not failures:
+        print(f"✅ {len(FIND_SHAPES) + len(AGGREGATE_SHAPES)} query shapes use indexes")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,85 @@
+"""
+Converts chats stored one-document-per-message into the bucketed layout.
+
+    python -m scripts.migrate_to_buckets            # every documents-layout chat
+    python -m scripts.migrate_to_buckets <chat_id>  # a single chat
+
+Each chat is copied in _id order, flipped to storage="buckets", and only
+then are its old message documents deleted, so an interrupted run can be
+re-started safely (partially written buckets are cleared first).
+
+Run it with uploads stopped. Chats still uploading and tombstoned chats are
+skipped, and a chat that changed during its copy (its message_count or
+updated_at moved, or new message documents appeared) is left in the
+documents layout for a later run. An append that is still writing when the
+chat is flipped cannot be detected.
+"""
+import asyncio
+import sys
+from typing import Optional
+
+from bson import ObjectId
+
+from database import db
+from services.message_store import STORES, READ_BATCH_SIZE
+from services.nlp import analyze_sentiment
+from utils.mongo import iter_batches
+
+FIELDS = ("sender", "timestamp", "text", "sentiment", "seq")
+
+# Documents-layout chats that are neither mid-upload nor tombstoned
+MIGRATABLE = {"storage": {"$ne": "buckets"}, "status": {"$ne": "uploading"}, "deleted_at": None}
+
+
+async def migrate_chat(chat: dict) -> Optional[int]:
+    """Messages moved, or None if the chat changed during the copy."""
+    documents, buckets = STORES["documents"], STORES["buckets"]
+    chat_id = chat["_id"]
+
+    # Clear leftovers of an interrupted run
+    await buckets.collection.delete_many({"chat_id": chat_id})
+
+    migrated = 0
+    cursor = documents.collection.find({"chat_id": chat_id}).sort("_id", 1)
+    async for batch in iter_batches(cursor, READ_BATCH_SIZE):
+        rows = []
+        for msg in batch:
+            row = {f: msg.get(f) for f in FIELDS}
+            if row["sentiment"] is None:
+                row["sentiment"] = analyze_sentiment(row["text"] or "")
+            rows.append(row)
+        await buckets.insert(chat_id, rows)
+        migrated += len(rows)
+
+    # Flip only if nothing was written to the chat while it was copied
+    unchanged = await documents.collection.count_documents({"chat_id": chat_id}) == migrated
+    if unchanged:
+        result = await db.chats.update_one(
+            {**MIGRATABLE, "_id": chat_id,
+             "message_count": chat.get("message_count"), "updated_at": chat.get("updated_at")},
+            {"$set": {"storage": buckets.layout, "message_count": migrated}},
+        )
+        unchanged = result.modified_count == 1
+    if not unchanged:
+        await buckets.collection.delete_many({"chat_id": chat_id})
+        return None
+    await documents.collection.delete_many({"chat_id": chat_id})
+    return migrated
+
+
+async def main(argv) -> int:
+    query = dict(MIGRATABLE)
+    if argv:
+        query["_id"] = ObjectId(argv[0])
+
+    async for chat in db.chats.find(query, {"_id": 1, "message_count": 1, "updated_at": 1}):
+        count = await migrate_chat(chat)
+        if count is None:
+            print(f"⚠️ {chat['_id']}: changed during the copy, skipped")
+        else:
+            print(f"✅ {chat['_id']}: {count} messages moved to buckets")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
@@ -0,0 +1,122 @@
+"""
+Time-series activity rollups: messages per hour of day, day of week and
+calendar day, plus a weekday x hour heatmap per participant.
+
+Built at ingest with NumPy (bincount over epoch-second arrays) one batch at a
+time; rollups of consecutive batches merge by addition, so the stored rollup
+on the chat is updated incrementally like its analytics aggregates.
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.mongo import escape_key, unescape_key
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+CELLS = 7 * 24  # weekday x hour grid of one participant
+EPOCH = date(1970, 1, 1)
+
+
+class ActivityRollup:
+    def __init__(self):
+        self.by_hour = np.zeros(24, dtype=np.int64)
+        self.by_weekday = np.zeros(7, dtype=np.int64)
+        self.by_day: Counter = Counter()  # epoch day -> messages
+        self.heatmap: Dict[str, np.ndarray] = {}  # sender -> (7, 24) counts
+        self.first_message: Optional[datetime] = None
+        self.last_message: Optional[datetime] = None
+
+    def add_many(self, messages: List[Dict]):
+        dated = [m for m in messages if m.get("timestamp")]
+        if not dated:
+            return
+        seconds = np.array([m["timestamp"] for m in dated], dtype="datetime64[s]").astype(np.int64)
+        days = seconds // 86400
+        hours = (seconds // 3600) % 24
+        weekdays = (days + 3) % 7  # 1970-01-01 was a Thursday
+
+        self.by_hour += np.bincount(hours, minlength=24)
+        self.by_weekday += np.bincount(weekdays, minlength=7)
+        unique_days, day_counts = np.unique(days, return_counts=True)
+        self.by_day.update(dict(zip(unique_days.tolist(), day_counts.tolist())))
+
+        names, codes = np.unique(
+            np.array([m.get("sender") or "Unknown" for m in dated], dtype=object), return_inverse=True
+        )
+        cells = np.bincount(codes * CELLS + weekdays * 24 + hours, minlength=len(names) * CELLS)
+        for name, grid in zip(names.tolist(), cells.reshape(len(names), 7, 24)):
+            if name in self.heatmap:
+                self.heatmap[name] += grid
+            else:
+                self.heatmap[name] = grid
+
+        first = dated[int(seconds.argmin())]["timestamp"]
+        last = dated[int(seconds.argmax())]["timestamp"]
+        if self.first_message is None or first < self.first_message:
+            self.first_message = first
+        if self.last_message is None or last > self.last_message:
+            self.last_message = last
+
+    def merge(self, other: "ActivityRollup"):
+        self.by_hour += other.by_hour
+        self.by_weekday += other.by_weekday
+        self.by_day.update(other.by_day)
+        for name, grid in other.heatmap.items():
+            self.heatmap[name] = self.heatmap[name] + grid if name in self.heatmap else grid.copy()
+        if other.first_message and (self.first_message is None or other.first_message < self.first_message):
+            self.first_message = other.first_message
+        if other.last_message and (self.last_message is None or other.last_message > self.last_message):
+            self.last_message = other.last_message
+        return self
+
+    def to_doc(self) -> Dict:
+        """Serializable rollup, stored on the chat as `activity`."""
+        return {
+            "by_hour": self.by_hour.tolist(),
+            "by_weekday": self.by_weekday.tolist(),
+            "by_day": {str(day): count for day, count in self.by_day.items()},
+            "heatmap": {escape_key(name): grid.tolist() for name, grid in self.heatmap.items()},
+            "first_message": self.first_message,
+            "last_message": self.last_message,
+        }
+
+    @classmethod
+    def from_doc(cls, doc: Dict) -> "ActivityRollup":
+        rollup = cls()
+        rollup.by_hour = np.array(doc["by_hour"], dtype=np.int64)
+        rollup.by_weekday = np.array(doc["by_weekday"], dtype=np.int64)
+        rollup.by_day = Counter({int(day): count for day, count in doc["by_day"].items()})
+        rollup.heatmap = {unescape_key(k): np.array(v, dtype=np.int64) for k, v in doc["heatmap"].items()}
+        rollup.first_message = doc["first_message"]
+        rollup.last_message = doc["last_message"]
+        return rollup
+
+    def report(self) -> Dict:
+        timeline = []
+        if self.by_day:
+            first, last = min(self.by_day), max(self.by_day)
+            timeline = [
+                {"date": (EPOCH + timedelta(days=day)).isoformat(), "count": self.by_day.get(day, 0)}
+                for day in range(first, last + 1)
+            ]
+        return {
+            "by_hour": self.by_hour.tolist(),
+            "by_weekday": dict(zip(WEEKDAYS, self.by_weekday.tolist())),
+            "timeline": timeline,
+            "heatmap": {
+                "rows": WEEKDAYS,
+                "columns": list(range(24)),
+                "participants": {name: grid.tolist() for name, grid in sorted(self.heatmap.items())},
+            },
+            "first_message": self.first_message,
+            "last_message": self.last_message,
+        }
+
+
+def rollup(messages: List[Dict]) -> ActivityRollup:
+    """Activity rollup for one batch; merge() the results."""
+    r = ActivityRollup()
+    r.add_many(messages)
+    return r
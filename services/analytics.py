@@ -1,74 +1,319 @@
-from collections import Counter
-from textblob import TextBlob
-from typing import List, Dict
+import asyncio
+import math
+import os
+from collections import Counter, deque
+from typing import AsyncIterable, List, Dict, Optional
 from datetime import datetime
 
 # Import advanced NLP functions
 from services.nlp import (
-    extract_action_items,
-    advanced_summary,
-    keyword_extract
+    sentiment_score,
+    label_sentiment,
+    keyword_tokens,
+    format_keywords,
+    is_action_item,
+    render_summary,
 )
+from utils.mongo import escape_key, unescape_key
+from utils.sketches import SpaceSaving, proportion_margin
+
+# Messages per shard when analytics are fanned out over worker processes
+ANALYTICS_SHARD_SIZE = int(os.getenv("ANALYTICS_SHARD_SIZE", "5000"))
+
+# Bounds on the partial aggregates persisted on a chat document (16 MB limit)
+AGGREGATE_KEYWORDS = int(os.getenv("AGGREGATE_KEYWORDS", "1000"))
+ACTION_ITEMS_LIMIT = int(os.getenv("ACTION_ITEMS_LIMIT", "200"))
+ACTION_ITEM_MAX_CHARS = 1000
+
+# Approximate mode: keyword counters kept and messages sampled per request
+APPROX_KEYWORD_CAPACITY = int(os.getenv("APPROX_KEYWORD_CAPACITY", "2000"))
+APPROX_SAMPLE_SIZE = int(os.getenv("APPROX_SAMPLE_SIZE", "2000"))
+
+
+class AnalyticsAccumulator:
+    """
+    Single-pass analytics state. Each message is tokenized and scored exactly
+    once in add(); every report section is derived from these accumulators.
+    """
+
+    def __init__(self):
+        self.message_count = 0
+        self.speaker_stats: Counter = Counter()
+        self.sentiments = {"positive": 0, "neutral": 0, "negative": 0}
+        self.keywords: Counter = Counter()
+        self.action_items: List[str] = []
+        # All action items seen; can exceed len(action_items) once restored from a doc
+        self.action_item_count = 0
+
+        # Summary signals
+        self.text_count = 0
+        self.sentiment_sum = 0.0
+        self.positive_msg: Optional[str] = None
+        self.negative_msg: Optional[str] = None
+        self.first_text: Optional[str] = None
+        self.last_text: Optional[str] = None
+
+    def add(self, message: Dict):
+        self.message_count += 1
+        self.speaker_stats[message.get("sender", "Unknown")] += 1
+
+        text = message.get("text", "")
+        if not text or not text.strip():
+            return
+
+        if is_action_item(text):
+            self.action_items.append(text)
+            self.action_item_count += 1
+
+        self.keywords.update(keyword_tokens(text))
+
+        score = sentiment_score(text)
+        self.sentiments[label_sentiment(score)] += 1
+        self.sentiment_sum += score
+        if score >= 0.4:
+            if self.positive_msg is None:
+                self.positive_msg = text
+        elif score <= -0.4:
+            if self.negative_msg is None:
+                self.negative_msg = text
+
+        if self.first_text is None:
+            self.first_text = text
+        self.last_text = text
+        self.text_count += 1
+
+    def add_many(self, messages: List[Dict]):
+        for m in messages:
+            self.add(m)
+
+    def merge(self, other: "AnalyticsAccumulator"):
+        """Folds in the state of an accumulator that saw the following messages."""
+        self.message_count += other.message_count
+        self.speaker_stats.update(other.speaker_stats)
+        for label, count in other.sentiments.items():
+            self.sentiments[label] += count
+        self.keywords.update(other.keywords)
+        self.action_items.extend(other.action_items)
+        self.action_item_count += other.action_item_count
+
+        self.sentiment_sum += other.sentiment_sum
+        if self.positive_msg is None:
+            self.positive_msg = other.positive_msg
+        if self.negative_msg is None:
+            self.negative_msg = other.negative_msg
+        if self.first_text is None:
+            self.first_text = other.first_text
+        if other.last_text is not None:
+            self.last_text = other.last_text
+        self.text_count += other.text_count
+        return self
+
+    def to_doc(self) -> Dict:
+        """
+        Serializable state, stored on the chat as its partial aggregates.
+        Only the AGGREGATE_KEYWORDS most frequent keywords and the
+        ACTION_ITEMS_LIMIT most recent action items (each cut to
+        ACTION_ITEM_MAX_CHARS) are kept, so the document stays bounded; later
+        merges into it are approximate for keywords outside that set, and
+        action_item_count keeps the full count.
+        """
+        return {
+            "message_count": self.message_count,
+            "speaker_stats": {escape_key(k): v for k, v in self.speaker_stats.items()},
+            "sentiments": dict(self.sentiments),
+            "keywords": dict(self.keywords.most_common(AGGREGATE_KEYWORDS)),
+            "action_items": [item[:ACTION_ITEM_MAX_CHARS] for item in self.action_items[-ACTION_ITEMS_LIMIT:]],
+            "action_item_count": self.action_item_count,
+            "text_count": self.text_count,
+            "sentiment_sum": self.sentiment_sum,
+            "positive_msg": self.positive_msg,
+            "negative_msg": self.negative_msg,
+            "first_text": self.first_text,
+            "last_text": self.last_text,
+        }
+
+    @classmethod
+    def from_doc(cls, doc: Dict) -> "AnalyticsAccumulator":
+        acc = cls()
+        acc.message_count = doc["message_count"]
+        acc.speaker_stats = Counter({unescape_key(k): v for k, v in doc["speaker_stats"].items()})
+        acc.sentiments.update(doc["sentiments"])
+        acc.keywords = Counter(doc["keywords"])
+        acc.action_items = list(doc["action_items"])
+        acc.action_item_count = doc.get("action_item_count", len(doc["action_items"]))
+        acc.text_count = doc["text_count"]
+        acc.sentiment_sum = doc["sentiment_sum"]
+        acc.positive_msg = doc["positive_msg"]
+        acc.negative_msg = doc["negative_msg"]
+        acc.first_text = doc["first_text"]
+        acc.last_text = doc["last_text"]
+        return acc
+
+    def summary(self) -> str:
+        if not self.text_count:
+            return "No content to summarize."
+        return render_summary(
+            avg_sent=self.sentiment_sum / self.text_count,
+            top_topics=[k for k, _ in self.keywords.most_common(5)],
+            positive_msg=self.positive_msg,
+            negative_msg=self.negative_msg,
+            first_text=self.first_text,  # type: ignore[arg-type]
+            last_text=self.last_text,  # type: ignore[arg-type]
+        )
+
+    def report(self) -> Dict:
+        speaker_stats: Dict[str, int] = dict(self.speaker_stats)
+        top_participant = (max(speaker_stats, key=speaker_stats.get) if speaker_stats else "Unknown") #type: ignore[arg-type]
+
+        # --- Productivity Score ---
+        # Heuristic: balanced participation + positive tone + fewer negatives
+        sentiments = dict(self.sentiments)
+        total_msgs = sum(sentiments.values())
+        pos_ratio = sentiments["positive"] / total_msgs if total_msgs else 0
+        neg_ratio = sentiments["negative"] / total_msgs if total_msgs else 0
+        balance = 1 - abs(max(speaker_stats.values(), default=1) - min(speaker_stats.values(), default=1)) / max(speaker_stats.values(), default=1)
+        productivity_score = round((pos_ratio * 50 + balance * 30 + (1 - neg_ratio) * 20), 2)
+
+        return {
+            "message_count": self.message_count,
+            "speaker_stats": speaker_stats,
+            "top_participant": top_participant,
+            "sentiment_stats": sentiments,
+            "top_keywords": format_keywords(self.keywords),
+            "action_items": list(self.action_items),
+            "action_item_count": self.action_item_count,
+            "summary": self.summary(),
+            "productivity_score": productivity_score,
+            "generated_on": datetime.utcnow().isoformat()
+        }
+
+
+def accumulate(messages: List[Dict]) -> AnalyticsAccumulator:
+    """Partial analytics for one batch; merge() the results in message order."""
+    acc = AnalyticsAccumulator()
+    acc.add_many(messages)
+    return acc
+
+
+class ApproxAccumulator:
+    """
+    Analytics estimated from a random sample of a very large chat: keywords
+    go through a Space-Saving sketch and sentiment is scored only on the
+    sampled texts, so latency and memory do not grow with the chat.
+    """
+
+    def __init__(self, capacity: int = APPROX_KEYWORD_CAPACITY):
+        self.message_count = 0
+        self.keywords = SpaceSaving(capacity)
+        self.texts: List[str] = []
+        self.text_tokens: List[Counter] = []  # per sampled text, for sampling variance
+
+    def add_many(self, messages: List[Dict]):
+        for m in messages:
+            self.message_count += 1
+            text = m.get("text", "")
+            if not text or not text.strip():
+                continue
+            tokens = keyword_tokens(text)
+            self.keywords.update(tokens)
+            self.texts.append(text)
+            self.text_tokens.append(Counter(tokens))
+
+    def _total_margin(self, keyword: str, population: int, z: float = 1.96) -> float:
+        """95% margin of the estimated chat-wide count of keyword."""
+        sampled = self.message_count
+        if sampled < 2 or sampled >= population:
+            return 0.0
+        values = [c[keyword] for c in self.text_tokens if keyword in c]
+        mean = sum(values) / sampled
+        variance = (sum(v * v for v in values) - sampled * mean * mean) / (sampled - 1)
+        fpc = (population - sampled) / (population - 1)
+        return z * population * math.sqrt(max(variance, 0.0) / sampled * fpc)
+
+    def report(self, sample_labels: List[str], population: int, n: int = 10) -> Dict:
+        """
+        Estimates for the whole chat of `population` messages. sample_labels
+        are the sentiments of self.texts. Keyword counts are scaled up from
+        the sample; their error is the scaled sketch error plus a 95% margin
+        from the per-message variance of the keyword's count in the sample.
+        """
+        scale = population / self.message_count if self.message_count else 0.0
+        texts_population = round(len(self.texts) * scale)
+        sampled = len(sample_labels)
+        counts = Counter(sample_labels)
+
+        sentiments = []
+        for label in ("positive", "neutral", "negative"):
+            p = counts[label] / sampled if sampled else 0.0
+            margin = proportion_margin(p, sampled, texts_population)
+            sentiments.append({
+                "_id": label,
+                "count": round(p * texts_population),
+                "ratio": round(p, 4),
+                "margin": round(margin, 4),
+            })
+
+        keywords = []
+        for k, count, error in self.keywords.top(n):
+            keywords.append({
+                "keyword": k,
+                "count": round(count * scale),
+                "error": round(error * scale + self._total_margin(k, population)),
+            })
+        return {
+            "mode": "approx",
+            "message_count": population,
+            "sampled_messages": self.message_count,
+            "keywords": keywords,
+            "keyword_error_bound": round(self.keywords.error_bound * scale, 2),
+            "sentiments": sentiments,
+            "sentiment_sample_size": sampled,
+            "confidence": 0.95,
+            "generated_on": datetime.utcnow().isoformat(),
+        }
+
+
+def shards(messages: List[Dict], size: int = ANALYTICS_SHARD_SIZE):
+    """Splits a message list into consecutive shards of at most `size` messages."""
+    for start in range(0, len(messages), size):
+        yield messages[start:start + size]
+
+
+def reduce_accumulators(parts) -> AnalyticsAccumulator:
+    """Merges per-shard accumulators, which must be given in message order."""
+    acc = AnalyticsAccumulator()
+    for part in parts:
+        acc.merge(part)
+    return acc
+
+
+async def accumulate_parallel(batches: AsyncIterable[List[Dict]], pool) -> AnalyticsAccumulator:
+    """
+    Map-reduce over message shards: every batch is accumulated in a worker
+    process of `pool` and the partials are merged in order, so the result is
+    identical to accumulate() over the concatenated batches. Up to two shards
+    per worker are in flight, which keeps memory bounded for huge chats.
+    """
+    acc = AnalyticsAccumulator()
+    pending: deque = deque()
+    window = 2 * pool.workers
+    try:
+        async for batch in batches:
+            pending.append(asyncio.ensure_future(pool.run(accumulate, batch)))
+            if len(pending) >= window:
+                acc.merge(await pending.popleft())
+        while pending:
+            acc.merge(await pending.popleft())
+    finally:
+        for task in pending:
+            task.cancel()
+    return acc
+
 
 def compute_analytics(messages: List[Dict]) -> Dict:
     """
     Performs advanced analytics on a list of chat/meeting messages.
     Each message is a dict with keys: sender, text, timestamp.
+    All sections come from one pass over the messages.
     """
-
-    # --- 1️⃣ Basic counts ---
-    message_count = len(messages)
-    participants = [m.get("sender", "Unknown") for m in messages]
-    speaker_stats: Dict[str, int] = dict(Counter(participants))
-    top_participant = (max(speaker_stats, key=speaker_stats.get) if speaker_stats else "Unknown") #type: ignore[arg-type]
-
-    # --- 2️⃣ Sentiment Analysis ---
-    sentiments = {"positive": 0, "neutral": 0, "negative": 0}
-    sentiment_labels = []  # for later correlation
-    for m in messages:
-        text = m.get("text", "")
-        if not text or not text.strip():
-            sentiment_labels.append("neutral")
-            continue
-        polarity = TextBlob(text).sentiment.polarity  # type: ignore[attr-defined]
-        if polarity > 0.2:
-            sentiments["positive"] += 1
-            sentiment_labels.append("positive")
-        elif polarity < -0.2:
-            sentiments["negative"] += 1
-            sentiment_labels.append("negative")
-        else:
-            sentiments["neutral"] += 1
-            sentiment_labels.append("neutral")
-
-   
-    # --- 4️⃣ Keyword Extraction (smart version) ---
-    all_texts = [m.get("text", "") for m in messages if m.get("text", "").strip()]
-    top_keywords = keyword_extract(all_texts)
-
-    # --- 5️⃣ Action Item Extraction ---
-    action_items = extract_action_items(messages)
-
-    # --- 6️⃣ AI Summary (Optional, GPT-assisted) ---
-    summary = advanced_summary(all_texts)
-
-    # --- 7️⃣ Productivity Score ---
-    # Heuristic: balanced participation + positive tone + fewer negatives
-    total_msgs = sum(sentiments.values())
-    pos_ratio = sentiments["positive"] / total_msgs if total_msgs else 0
-    neg_ratio = sentiments["negative"] / total_msgs if total_msgs else 0
-    balance = 1 - abs(max(speaker_stats.values(), default=1) - min(speaker_stats.values(), default=1)) / max(speaker_stats.values(), default=1)
-    productivity_score = round((pos_ratio * 50 + balance * 30 + (1 - neg_ratio) * 20), 2)
-
-    # --- 8️⃣ Return Complete Analytics Report ---
-    return {
-        "message_count": message_count,
-        "speaker_stats": speaker_stats,
-        "top_participant": top_participant,
-        "sentiment_stats": sentiments,
-        "top_keywords": top_keywords,
-        "action_items": action_items,
-        "summary": summary,
-        "productivity_score": productivity_score,
-        "generated_on": datetime.utcnow().isoformat()
-    }
+    return accumulate(messages).report()
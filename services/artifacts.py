@@ -0,0 +1,122 @@
+"""
+On-disk, content-addressed store for rendered report artifacts (PDF / CSV).
+
+Files live at ARTIFACT_DIR/<sha256>.<ext>. The report document records which
+digest was rendered from which report content (its fingerprint), so a report
+that is regenerated or edited gets a fresh artifact.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", "artifacts")
+ARTIFACT_CHUNK_SIZE = 64 * 1024
+
+# Sweep limits; a swept artifact is simply re-rendered on its next download
+ARTIFACT_MAX_AGE_DAYS = float(os.getenv("ARTIFACT_MAX_AGE_DAYS", "30"))
+ARTIFACT_MAX_BYTES = int(os.getenv("ARTIFACT_MAX_BYTES", str(1024 ** 3)))
+
+MEDIA_TYPES = {"pdf": "application/pdf", "csv": "text/csv"}
+
+
+def artifact_path(digest: str, fmt: str) -> str:
+    return os.path.join(ARTIFACT_DIR, f"{digest}.{fmt}")
+
+
+def report_fingerprint(report_doc: dict) -> str:
+    """Hash of the report content an artifact is rendered from."""
+    content = {k: v for k, v in report_doc.items() if k not in ("_id", "artifacts")}
+    raw = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def store_artifact(data: bytes, fmt: str) -> dict:
+    """Writes data under its digest (atomically) and returns {digest, size}."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = artifact_path(digest, fmt)
+    if not os.path.exists(path):
+        os.makedirs(ARTIFACT_DIR, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=ARTIFACT_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    return {"digest": digest, "size": len(data)}
+
+
+def remove_artifact(digest: str, fmt: str):
+    try:
+        os.remove(artifact_path(digest, fmt))
+    except FileNotFoundError:
+        pass
+
+
+def sweep_artifacts(max_age_days: float = ARTIFACT_MAX_AGE_DAYS, max_bytes: int = ARTIFACT_MAX_BYTES) -> int:
+    """
+    Deletes artifacts older than max_age_days, then the oldest remaining ones
+    until the directory is under max_bytes. Returns the number of files removed.
+    """
+    try:
+        entries = [e for e in os.scandir(ARTIFACT_DIR) if e.is_file()]
+    except FileNotFoundError:
+        return 0
+
+    cutoff = time.time() - max_age_days * 86400
+    files = sorted((e.stat().st_mtime, e.stat().st_size, e.path) for e in entries)
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for mtime, size, path in files:
+        if mtime >= cutoff and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        total -= size
+    return removed
+
+
+def build_artifact(report_doc: dict, fmt: str) -> dict:
+    """Renders the report and stores it; runs inside a worker process."""
+    if fmt == "csv":
+        from services.csv_export import iter_report_csv
+        return store_artifact(b"".join(iter_report_csv(report_doc)), fmt)
+
+    from services.report_gen import generate_pdf
+    return store_artifact(generate_pdf(report_doc).getvalue(), fmt)
+
+
+def parse_range(header: str, size: int):
+    """
+    Parses a single "bytes=start-end" range. Returns (start, end) inclusive,
+    None when no usable range was sent, or raises ValueError if unsatisfiable.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_s, _, end_s = header[len("bytes="):].strip().partition("-")
+    try:
+        if start_s:
+            start = int(start_s)
+            end = min(int(end_s), size - 1) if end_s else size - 1
+        else:
+            start, end = max(size - int(end_s), 0), size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+def iter_file(path: str, start: int, end: int):
+    """Yields bytes start..end (inclusive) of a file in fixed-size chunks."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(ARTIFACT_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
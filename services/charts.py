@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+from io import BytesIO
+from threading import Lock
+
+import matplotlib
+matplotlib.use("Agg")  # non-interactive backend, never opens a GUI
+from matplotlib.figure import Figure
+
+from utils.cache import LRUCache
+
+# Rendered PNGs keyed by chart kind + data hash (per process)
+CHART_CACHE_SIZE = int(os.getenv("CHART_CACHE_SIZE", "256"))
+chart_cache = LRUCache(CHART_CACHE_SIZE)
+
+# Preconfigured figure templates, one reusable Figure per chart kind
+TEMPLATES = {
+    "sentiment_pie": {"figsize": (4, 4), "title": "Sentiment Distribution"},
+    "participant_bar": {"figsize": (5, 3), "title": "Messages per Participant"},
+    "emotion_bar": {"figsize": (5, 3), "title": "Emotion Distribution"},
+}
+_figures: dict = {}
+_render_lock = Lock()
+
+
+def _chart_key(kind: str, data: dict) -> str:
+    raw = json.dumps([kind, list(data.items())], default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _figure(kind: str) -> Figure:
+    fig = _figures.get(kind)
+    if fig is None:
+        fig = _figures[kind] = Figure(figsize=TEMPLATES[kind]["figsize"])
+    fig.clear()
+    return fig
+
+
+def _draw_sentiment_pie(ax, labels, values):
+    ax.pie(values, labels=labels, autopct="%1.1f%%", startangle=90)
+
+
+def _draw_participant_bar(ax, labels, values):
+    ax.barh(labels, values)
+    ax.set_xlabel("Message Count")
+
+
+def _draw_emotion_bar(ax, labels, values):
+    ax.bar(labels, values, color='skyblue')
+    ax.set_ylabel("Count")
+    for tick in ax.get_xticklabels():
+        tick.set_rotation(30)
+        tick.set_ha('right')
+
+
+_DRAWERS = {
+    "sentiment_pie": _draw_sentiment_pie,
+    "participant_bar": _draw_participant_bar,
+    "emotion_bar": _draw_emotion_bar,
+}
+
+
+def render_chart(kind: str, data: dict) -> BytesIO:
+    """Returns the chart as a PNG stream, rendering only on a cache miss."""
+    key = _chart_key(kind, data)
+    png = chart_cache.get(key)
+    if png is None:
+        with _render_lock:
+            fig = _figure(kind)
+            ax = fig.add_subplot()
+            _DRAWERS[kind](ax, list(data.keys()), list(data.values()))
+            ax.set_title(TEMPLATES[kind]["title"], fontsize=10)
+            fig.tight_layout()
+
+            img = BytesIO()
+            fig.savefig(img, format="png")
+            png = img.getvalue()
+        chart_cache.set(key, png)
+    return BytesIO(png)
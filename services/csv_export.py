@@ -0,0 +1,59 @@
+"""Dependency-light CSV export: rows are encoded and yielded incrementally."""
+import csv
+from io import StringIO
+
+
+def _csv_line(*values) -> bytes:
+    buf = StringIO()
+    csv.writer(buf, lineterminator="\n").writerow(values)
+    return buf.getvalue().encode("utf-8")
+
+
+def _stat_rows(stats):
+    """Accepts {label: count} or aggregation output [{"_id": label, "count": n}]."""
+    if isinstance(stats, list):
+        return [(s.get("_id"), s.get("count")) for s in stats]
+    return list((stats or {}).items())
+
+
+def iter_report_csv(report_doc: dict):
+    """Yields the report as CSV sections, one encoded row at a time."""
+    yield _csv_line("chat_id", "uploaded_by", "productivity_score", "summary")
+    yield _csv_line(
+        report_doc.get("chat_id"),
+        report_doc.get("uploaded_by"),
+        report_doc.get("productivity_score"),
+        report_doc.get("summary"),
+    )
+
+    yield b"\n\nSpeaker Stats\n"
+    yield _csv_line("speaker", "message_count")
+    for speaker, count in _stat_rows(report_doc.get("speaker_stats", {})):
+        yield _csv_line(speaker, count)
+
+    yield b"\n\nSentiment Stats\n"
+    yield _csv_line("sentiment", "count")
+    for label, count in _stat_rows(report_doc.get("sentiment_stats", {})):
+        yield _csv_line(label, count)
+
+    yield b"\n\nTop Keywords\n"
+    yield _csv_line("keyword", "count")
+    for kw in report_doc.get("top_keywords", []):
+        yield _csv_line(kw.get("keyword"), kw.get("count"))
+
+
+MESSAGE_CSV_FIELDS = ("sender", "timestamp", "text", "sentiment")
+
+
+def message_csv_header() -> bytes:
+    return _csv_line(*MESSAGE_CSV_FIELDS)
+
+
+def message_csv_rows(messages) -> bytes:
+    """Encodes one batch of messages as CSV rows."""
+    buf = StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    for m in messages:
+        ts = m.get("timestamp")
+        writer.writerow((m.get("sender"), ts.isoformat() if ts else "", m.get("text"), m.get("sentiment")))
+    return buf.getvalue().encode("utf-8")
@@ -0,0 +1,186 @@
+"""
+Message storage layouts.
+
+"documents": one document per chat line in db.messages (original layout).
+"buckets":   per-chat bucket documents in db.message_buckets, each holding up
+             to MESSAGE_BUCKET_SIZE messages as columnar arrays.
+
+Every read path goes through store_for(chat), which picks the layout the chat
+was written with, so both layouts can coexist during a migration.
+
+Messages uploaded with a `seq` (their position in the chat) can be fetched
+by it: documents store it per message, buckets as `first_seq`.
+"""
+import asyncio
+import math
+import os
+import random
+from database import db
+from utils.mongo import iter_batches
+
+MESSAGE_STORAGE = os.getenv("MESSAGE_STORAGE", "documents")
+MESSAGE_BUCKET_SIZE = int(os.getenv("MESSAGE_BUCKET_SIZE", "500"))
+READ_BATCH_SIZE = int(os.getenv("READ_BATCH_SIZE", "1000"))
+
+BUCKET_FIELDS = ("sender", "timestamp", "text", "sentiment")
+
+
+class DocumentStore:
+    layout = "documents"
+    collection = db.messages
+
+    async def insert(self, chat_id, messages: list):
+        for msg in messages:
+            msg["chat_id"] = chat_id
+        await self.collection.insert_many(messages)
+
+    async def iter_batches(self, chat_id, fields, batch_size: int):
+        projection = {"_id": 0, **{f: 1 for f in fields}}
+        cursor = self.collection.find({"chat_id": chat_id}, projection)
+        async for batch in iter_batches(cursor, batch_size):
+            yield batch
+
+    async def count(self, chat_id) -> int:
+        return await self.collection.count_documents({"chat_id": chat_id})
+
+    async def sample(self, chat_id, count: int, size: int, fields) -> list:
+        """
+        About `size` uniformly random messages. Random positions are looked up
+        by seq, so the cost does not depend on the chat's length; chats stored
+        before seq existed fall back to a server-side $sample.
+        """
+        projection = {"_id": 0, **{f: 1 for f in fields}}
+        if count:
+            seqs = random.sample(range(count), min(size, count))
+            cursor = self.collection.find({"chat_id": chat_id, "seq": {"$in": seqs}}, projection)
+            found = await cursor.to_list(length=None)
+            if found:
+                return found
+        cursor = await self.collection.aggregate([
+            {"$match": {"chat_id": chat_id}},
+            {"$sample": {"size": size}},
+            {"$project": projection},
+        ])
+        return await cursor.to_list(length=None)
+
+    async def truncate(self, chat_id, seq: int):
+        """Deletes the messages at position seq and later."""
+        await self.collection.delete_many({"chat_id": chat_id, "seq": {"$gte": seq}})
+
+    async def fetch(self, chat_id, seqs: list, fields) -> dict:
+        """Messages by their position in the chat, as {seq: message}."""
+        projection = {"_id": 0, "seq": 1, **{f: 1 for f in fields}}
+        cursor = self.collection.find({"chat_id": chat_id, "seq": {"$in": seqs}}, projection)
+        return {m.pop("seq"): m async for m in cursor}
+
+    def message_stages(self, chat_id) -> list:
+        """Aggregation stages that emit one document per message."""
+        return [{"$match": {"chat_id": chat_id}}]
+
+
+class BucketStore:
+    layout = "buckets"
+    collection = db.message_buckets
+
+    def __init__(self, bucket_size: int = MESSAGE_BUCKET_SIZE):
+        self.bucket_size = bucket_size
+
+    async def insert(self, chat_id, messages: list):
+        # Buckets sort by _id, which grows with insertion order
+        buckets = []
+        for i in range(0, len(messages), self.bucket_size):
+            chunk = messages[i:i + self.bucket_size]
+            bucket = {"chat_id": chat_id, "count": len(chunk), "first_seq": chunk[0].get("seq")}
+            for field in BUCKET_FIELDS:
+                bucket[field] = [m.get(field) for m in chunk]
+            buckets.append(bucket)
+        if buckets:
+            await self.collection.insert_many(buckets)
+
+    async def iter_batches(self, chat_id, fields, batch_size: int):
+        projection = {"_id": 0, **{f: 1 for f in fields}}
+        cursor = self.collection.find({"chat_id": chat_id}, projection).sort("_id", 1)
+        rows = []
+        async for bucket in cursor:
+            columns = [bucket[f] for f in fields]
+            rows.extend(dict(zip(fields, values)) for values in zip(*columns))
+            if len(rows) >= batch_size:
+                yield rows
+                rows = []
+        if rows:
+            yield rows
+
+    async def count(self, chat_id) -> int:
+        cursor = await self.collection.aggregate([
+            {"$match": {"chat_id": chat_id}},
+            {"$group": {"_id": None, "count": {"$sum": "$count"}}},
+        ])
+        result = await cursor.to_list(length=1)
+        return result[0]["count"] if result else 0
+
+    async def sample(self, chat_id, count: int, size: int, fields) -> list:
+        """
+        About `size` random messages: $sample picks random buckets (a scan of
+        bucket index entries only) and a few random rows are taken from each.
+        """
+        buckets_needed = min(size, max(1, math.ceil(count / self.bucket_size)))
+        per_bucket = math.ceil(size / buckets_needed)
+        cursor = await self.collection.aggregate([
+            {"$match": {"chat_id": chat_id}},
+            {"$sample": {"size": buckets_needed}},
+            {"$project": {"_id": 0, **{f: 1 for f in fields}}},
+        ])
+        rows = []
+        async for bucket in cursor:
+            columns = [bucket[f] for f in fields]
+            picked = random.sample(range(len(columns[0])), min(per_bucket, len(columns[0])))
+            rows.extend({f: column[i] for f, column in zip(fields, columns)} for i in picked)
+        return rows[:size]
+
+    async def truncate(self, chat_id, seq: int):
+        """Deletes the messages at position seq and later (buckets never straddle an upload)."""
+        await self.collection.delete_many({"chat_id": chat_id, "first_seq": {"$gte": seq}})
+
+    async def fetch(self, chat_id, seqs: list, fields) -> dict:
+        """Messages by their position in the chat, as {seq: message}."""
+        projection = {"_id": 0, "first_seq": 1, **{f: 1 for f in fields}}
+        buckets = await asyncio.gather(*(
+            self.collection.find_one(
+                {"chat_id": chat_id, "first_seq": {"$lte": seq}}, projection, sort=[("first_seq", -1)]
+            )
+            for seq in seqs
+        ))
+        found = {}
+        for seq, bucket in zip(seqs, buckets):
+            if bucket is None:
+                continue
+            offset = seq - bucket["first_seq"]
+            if offset < len(bucket[fields[0]]):
+                found[seq] = {f: bucket[f][offset] for f in fields}
+        return found
+
+    def message_stages(self, chat_id) -> list:
+        """Aggregation stages that unwind buckets into one document per message."""
+        return [
+            {"$match": {"chat_id": chat_id}},
+            {"$project": {"row": {"$zip": {"inputs": ["$sender", "$timestamp", "$sentiment"]}}}},
+            {"$unwind": "$row"},
+            {"$project": {
+                "sender": {"$arrayElemAt": ["$row", 0]},
+                "timestamp": {"$arrayElemAt": ["$row", 1]},
+                "sentiment": {"$arrayElemAt": ["$row", 2]},
+            }},
+        ]
+
+
+STORES = {"documents": DocumentStore(), "buckets": BucketStore()}
+
+
+def default_store():
+    """Layout used for newly uploaded chats."""
+    return STORES[MESSAGE_STORAGE]
+
+
+def store_for(chat: dict):
+    """Layout a stored chat was written with (chats predating buckets are documents)."""
+    return STORES[chat.get("storage", "documents")]
@@ -1,20 +1,52 @@
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from collections import Counter
 from datetime import datetime
 import re
 import os
+from utils.cache import LRUCache
 
 # -------------------------------------------------------
 # SENTIMENT ANALYZER
 # -------------------------------------------------------
-analyzer = SentimentIntensityAnalyzer()
+# Built lazily: importing VADER and loading its lexicon is slow, so it happens
+# on first use (or during startup warmup) instead of at import time
+_analyzer = None
+
+
+def get_analyzer():
+    global _analyzer
+    if _analyzer is None:
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
+# Chat text is highly repetitive ("ok", "haha", "<Media omitted>"), so
+# compound scores are memoized by normalized text (per process)
+SENTIMENT_CACHE_SIZE = int(os.getenv("SENTIMENT_CACHE_SIZE", "50000"))
+sentiment_cache = LRUCache(SENTIMENT_CACHE_SIZE)
 
 
 # -------------------------------------------------------
 # BASIC SENTIMENT
 # -------------------------------------------------------
-def analyze_sentiment(text: str) -> str:
-    score = analyzer.polarity_scores(text)["compound"]
+def normalize_text(text: str) -> str:
+    # VADER tokenizes on whitespace, so collapsing it never changes the score
+    return " ".join(text.split())
+
+
+def sentiment_score(text: str) -> float:
+    key = normalize_text(text)
+    score = sentiment_cache.get(key)
+    if score is None:
+        score = get_analyzer().polarity_scores(key)["compound"]
+        sentiment_cache.set(key, score)
+    return score
+
+
+def sentiment_cache_stats() -> dict:
+    return sentiment_cache.stats()
+
+
+def label_sentiment(score: float) -> str:
     if score >= 0.05:
         return "positive"
     elif score <= -0.05:
@@ -22,26 +54,51 @@ def analyze_sentiment(text: str) -> str:
     return "neutral"
 
 
+def analyze_sentiment(text: str) -> str:
+    return label_sentiment(sentiment_score(text))
+
+
+def analyze_sentiments(texts: list[str]) -> list[str]:
+    return [analyze_sentiment(t) for t in texts]
+
+
 # -------------------------------------------------------
 # KEYWORD EXTRACTION
 # -------------------------------------------------------
+KEYWORD_REGEX = re.compile(r"\b[a-zA-Z]{4,}\b")
+STOPWORDS = {"this", "that", "with", "from", "have", "your", "there", "they", "will", "about"}
+
+
+def keyword_tokens(text: str) -> list[str]:
+    return [w for w in KEYWORD_REGEX.findall(text.lower()) if w not in STOPWORDS]
+
+
+def format_keywords(counter: Counter, n: int = 10):
+    return [{"keyword": k, "count": v} for k, v in counter.most_common(n)]
+
+
 def keyword_extract(texts):
-    words = re.findall(r"\b[a-zA-Z]{4,}\b", " ".join(texts).lower())
-    stopwords = {"this", "that", "with", "from", "have", "your", "there", "they", "will", "about"}
-    words = [w for w in words if w not in stopwords]
-    common = Counter(words).most_common(10)
-    return [{"keyword": k, "count": v} for k, v in common]
+    counter = Counter()
+    for t in texts:
+        counter.update(keyword_tokens(t))
+    return format_keywords(counter)
 
 
 # -------------------------------------------------------
 # ACTION ITEMS
 # -------------------------------------------------------
+ACTION_REGEX = re.compile(
+    r"\b(need to|should|let's|will|plan to|decide|assign|do this|send|complete)\b",
+    re.IGNORECASE
+)
+
+
+def is_action_item(text: str) -> bool:
+    return ACTION_REGEX.search(text) is not None
+
+
 def extract_action_items(messages):
-    pattern = re.compile(
-        r"\b(need to|should|let's|will|plan to|decide|assign|do this|send|complete)\b",
-        re.IGNORECASE
-    )
-    return [msg["text"] for msg in messages if pattern.search(msg["text"])]
+    return [msg["text"] for msg in messages if is_action_item(msg["text"])]
 
 
 # -------------------------------------------------------
@@ -64,19 +121,34 @@ def advanced_summary(texts: list[str]) -> str:
     keywords = keyword_extract(texts)
     top_topics = [k['keyword'] for k in keywords[:5]]
 
-    # 2) Find emotional extremes
-    positive_msgs = []
-    negative_msgs = []
+    # 2) Find emotional extremes + overall tone, scoring each text once
+    positive_msg = None
+    negative_msg = None
+    total_sent = 0.0
 
     for t in texts:
-        score = analyzer.polarity_scores(t)["compound"]
+        score = sentiment_score(t)
+        total_sent += score
         if score >= 0.4:
-            positive_msgs.append(t)
+            positive_msg = positive_msg or t
         elif score <= -0.4:
-            negative_msgs.append(t)
+            negative_msg = negative_msg or t
+
+    return render_summary(
+        avg_sent=total_sent / len(texts),
+        top_topics=top_topics,
+        positive_msg=positive_msg,
+        negative_msg=negative_msg,
+        first_text=texts[0],
+        last_text=texts[-1],
+    )
+
+
+def render_summary(avg_sent: float, top_topics: list[str], positive_msg, negative_msg,
+                   first_text: str, last_text: str) -> str:
+    """Formats the local summary from precomputed signals."""
 
     # 3) Conversation tone
-    avg_sent = sum(analyzer.polarity_scores(t)["compound"] for t in texts) / len(texts)
     if avg_sent > 0.2:
         tone = "Mostly positive and supportive."
     elif avg_sent < -0.2:
@@ -85,8 +157,8 @@ def advanced_summary(texts: list[str]) -> str:
         tone = "Neutral or mixed tone."
 
     # 4) Start + End highlight
-    start = texts[0][:120] + "..." if len(texts[0]) > 120 else texts[0]
-    end = texts[-1][:120] + "..." if len(texts[-1]) > 120 else texts[-1]
+    start = first_text[:120] + "..." if len(first_text) > 120 else first_text
+    end = last_text[:120] + "..." if len(last_text) > 120 else last_text
 
     # 5) Build summary
     summary = [
@@ -100,16 +172,16 @@ def advanced_summary(texts: list[str]) -> str:
         "😊 Positive Moments:",
     ]
 
-    if positive_msgs:
-        summary.append(f"- Example: {positive_msgs[0][:120]}...")
+    if positive_msg:
+        summary.append(f"- Example: {positive_msg[:120]}...")
     else:
         summary.append("- No strong positive messages detected.")
 
     summary.append("")
     summary.append("😞 Negative / Emotional Moments:")
 
-    if negative_msgs:
-        summary.append(f"- Example: {negative_msgs[0][:120]}...")
+    if negative_msg:
+        summary.append(f"- Example: {negative_msg[:120]}...")
     else:
         summary.append("- No strong negative messages detected.")
 
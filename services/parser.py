@@ -1,20 +1,186 @@
 import re
+import codecs
+import hashlib
 from datetime import datetime
+from itertools import chain, islice
 
-WHATSAPP_REGEX = re.compile(
-    r"^(\d{1,2}/\d{1,2}/\d{2,4}),\s*(\d{1,2}:\d{2}(?:\s?[APMapm]{2})?)\s*-\s*(.*)$"
+# Header layouts: Android "dd/mm/yy, hh:mm - " and iOS "[dd/mm/yy, hh:mm:ss] "
+_DATE_TIME = (
+    r"(\d{1,2})/(\d{1,2})/(\d{2,4}),\s*(\d{1,2}):(\d{2})(?::(\d{2}))?"
+    r"(?:[\s\u202f]?([APap])\.?[Mm]\.?)?"
 )
+ANDROID_HEADER = re.compile(r"^" + _DATE_TIME + r"\s*-\s*(.*)$")
+IOS_HEADER = re.compile(r"^\u200e?\[" + _DATE_TIME + r"\]\s*(.*)$")
 
-def parse_whatsapp_chat(lines):
-    messages = []
-    current_message = None
+# Lines inspected to learn the export's layout before parsing starts
+DETECT_SAMPLE_LINES = 200
+
+_DAYS_IN_MONTH = (0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+# Size of each read from the uploaded file (bytes)
+READ_CHUNK_SIZE = 1 << 20
+
+
+def iter_lines(stream, chunk_size: int = READ_CHUNK_SIZE):
+    """
+    Yields normalized text lines from a binary file object, reading it in
+    fixed-size chunks so the whole export never sits in memory.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    pending = ""
+
+    while True:
+        chunk = stream.read(chunk_size)
+        final = not chunk
+        pending += decoder.decode(chunk or b"", final=final)
+
+        *complete, pending = pending.split("\n")
+        for line in complete:
+            yield _normalize_line(line)
+
+        if final:
+            break
+
+    yield _normalize_line(pending)
+
+
+def hash_stream(stream, chunk_size: int = READ_CHUNK_SIZE):
+    """Returns (sha256 hex digest, size in bytes) of a binary file object, read in chunks."""
+    digest = hashlib.sha256()
+    size = 0
+    while chunk := stream.read(chunk_size):
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _normalize_line(line: str) -> str:
+    # Drop CR and map en-dash / em-dash to hyphen for the regex
+    return line.replace("\r", "").replace("–", "-").replace("—", "-")
+
+
+# -------------------------------------------------------
+# TIMESTAMP LAYOUT DETECTION
+# -------------------------------------------------------
+class TimestampLayout:
+    """
+    A learned header layout: which regex (Android / iOS) and whether dates
+    are day-first. parse() never raises; it returns None on mismatch.
+    """
+    __slots__ = ("pattern", "day_first")
+
+    def __init__(self, pattern, day_first: bool):
+        self.pattern = pattern
+        self.day_first = day_first
+
+    def parse(self, line: str):
+        match = self.pattern.match(line)
+        if match is None:
+            return None
+        timestamp = _build_timestamp(match.groups(), self.day_first)
+        if timestamp is None:
+            return None
+        return timestamp, match.group(8)
+
+
+def _build_timestamp(groups, day_first: bool):
+    first, second, year, hour, minute, second_s, meridiem = groups[:7]
+    day, month = (int(first), int(second)) if day_first else (int(second), int(first))
+    year = int(year)
+    if year < 100:
+        # Same pivot as strptime's %y
+        year += 2000 if year < 69 else 1900
+    hour, minute = int(hour), int(minute)
+    seconds = int(second_s) if second_s else 0
+
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem in "pP" else 0)
+
+    if not (1 <= month <= 12 and 1 <= day <= _DAYS_IN_MONTH[month]):
+        return None
+    if month == 2 and day == 29 and not (year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)):
+        return None
+    if hour > 23 or minute > 59 or seconds > 59:
+        return None
+    return datetime(year, month, day, hour, minute, seconds)
+
+
+def detect_layout(lines):
+    """
+    Learns the header layout from a sample of lines. Dates are treated as
+    day-first unless the sample proves otherwise (a first field above 12 wins
+    for day-first, a second field above 12 for month-first).
+    Returns None when no header line is found.
+    """
+    hits = {ANDROID_HEADER: 0, IOS_HEADER: 0}
+    day_first = None
 
     for line in lines:
         line = line.strip()
+        for pattern in hits:
+            match = pattern.match(line)
+            if match is None:
+                continue
+            hits[pattern] += 1
+            first, second = int(match.group(1)), int(match.group(2))
+            if day_first is None:
+                if first > 12:
+                    day_first = True
+                elif second > 12:
+                    day_first = False
+            break
+
+    pattern = max(hits, key=hits.get)  # type: ignore[arg-type]
+    if not hits[pattern]:
+        return None
+    return TimestampLayout(pattern, day_first is not False)
 
-        match = WHATSAPP_REGEX.match(line)
+
+def _redetect(line: str, previous):
+    """Slow path for a line the current layout rejected: try every layout."""
+    candidates = [
+        TimestampLayout(pattern, day_first)
+        for pattern in (ANDROID_HEADER, IOS_HEADER)
+        for day_first in (True, False)
+    ]
+    if previous is not None:
+        candidates.sort(key=lambda l: (l.pattern is not previous.pattern, l.day_first != previous.day_first))
+
+    for layout in candidates:
+        parsed = layout.parse(line)
+        if parsed is not None:
+            return layout, parsed
+
+    # Looks like a header but the date is not valid in any layout
+    for pattern in (ANDROID_HEADER, IOS_HEADER):
+        match = pattern.match(line)
         if match:
-            date_str, time_str, rest = match.groups()
+            return previous, (None, match.group(8))
+    return previous, None
+
+
+# -------------------------------------------------------
+# MESSAGE PARSING
+# -------------------------------------------------------
+def iter_whatsapp_messages(lines):
+    """Generator version of parse_whatsapp_chat: yields one message at a time."""
+    current_message = None
+
+    lines = iter(lines)
+    sample = list(islice(lines, DETECT_SAMPLE_LINES))
+    layout = detect_layout(sample)
+
+    for line in chain(sample, lines):
+        line = line.strip()
+
+        parsed = layout.parse(line) if layout else None
+        if parsed is None and line and line[0] in "0123456789[\u200e":
+            layout, parsed = _redetect(line, layout)
+
+        if parsed is not None:
+            timestamp, rest = parsed
 
             # System messages (no sender)
             if ":" in rest:
@@ -25,18 +191,9 @@ def parse_whatsapp_chat(lines):
                 sender = "System"
                 text = rest.strip()
 
-            # Convert timestamp safely
-            timestamp = None
-            for fmt in ["%d/%m/%y %I:%M %p", "%d/%m/%Y %I:%M %p", "%d/%m/%y %H:%M", "%d/%m/%Y %H:%M"]:
-                try:
-                    timestamp = datetime.strptime(f"{date_str} {time_str}", fmt)
-                    break
-                except:
-                    pass
-
-            # Save previous multi-line message
+            # Emit previous multi-line message
             if current_message:
-                messages.append(current_message)
+                yield current_message
 
             current_message = {
                 "timestamp": timestamp,
@@ -51,6 +208,8 @@ def parse_whatsapp_chat(lines):
 
     # last message
     if current_message:
-        messages.append(current_message)
+        yield current_message
 
-    return messages
+
+def parse_whatsapp_chat(lines):
+    return list(iter_whatsapp_messages(lines))
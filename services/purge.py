@@ -0,0 +1,119 @@
+"""
+Background cascade deletion.
+
+Deleting a chat (or logging out) only tombstones it: chats and their reports
+get a `deleted_at` timestamp and every read filters on `deleted_at: None`.
+purge_worker() then removes messages, reports (and their rendered artifact
+files), search postings and finally the chat document in throttled batches. The work queue is the set of tombstoned chats, claimed
+with a lease, so a purge interrupted by a restart is picked up again.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+from database import db
+from services.artifacts import remove_artifact, sweep_artifacts
+from services.message_store import STORES
+from utils.executor import run_cpu
+
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "1000"))
+PURGE_BATCH_PAUSE = float(os.getenv("PURGE_BATCH_PAUSE", "0.05"))
+PURGE_POLL_INTERVAL = float(os.getenv("PURGE_POLL_INTERVAL", "30"))
+PURGE_LEASE = timedelta(minutes=5)
+# Uploads still "uploading" after this long died with their process
+UPLOAD_STALE_AFTER = timedelta(hours=float(os.getenv("UPLOAD_STALE_HOURS", "6")))
+ARTIFACT_SWEEP_INTERVAL = timedelta(hours=float(os.getenv("ARTIFACT_SWEEP_HOURS", "1")))
+
+_wakeup = asyncio.Event()
+
+
+async def tombstone_chats(chat_ids: list):
+    """Hides chats and their reports immediately; the worker purges them later."""
+    if not chat_ids:
+        return
+    now = datetime.utcnow()
+    await db.chats.update_many({"_id": {"$in": chat_ids}}, {"$set": {"deleted_at": now}})
+    await db.analysis_reports.update_many({"chat_id": {"$in": chat_ids}}, {"$set": {"deleted_at": now}})
+    _wakeup.set()
+
+
+async def _delete_in_batches(collection, query: dict):
+    while True:
+        ids = [d["_id"] async for d in collection.find(query, {"_id": 1}).limit(PURGE_BATCH_SIZE)]
+        if not ids:
+            return
+        await collection.delete_many({"_id": {"$in": ids}})
+        await asyncio.sleep(PURGE_BATCH_PAUSE)
+
+
+def _artifact_refs(report_doc: dict) -> set:
+    return {(fmt, a["digest"]) for fmt, a in report_doc.get("artifacts", {}).items()}
+
+
+async def release_artifacts(refs):
+    """Deletes artifact files that no remaining report points at."""
+    for fmt, digest in refs:
+        if not await db.analysis_reports.find_one({f"artifacts.{fmt}.digest": digest}, {"_id": 1}):
+            await run_cpu(remove_artifact, digest, fmt)
+
+
+async def purge_chat(chat_id):
+    for store in STORES.values():
+        await _delete_in_batches(store.collection, {"chat_id": chat_id})
+    refs = set()
+    async for report in db.analysis_reports.find(
+        {"chat_id": chat_id, "artifacts": {"$exists": True}}, {"artifacts": 1}
+    ):
+        refs |= _artifact_refs(report)
+    await _delete_in_batches(db.analysis_reports, {"chat_id": chat_id})
+    await release_artifacts(refs)
+    await _delete_in_batches(db.search_postings, {"chat_id": chat_id})
+    await db.chats.delete_one({"_id": chat_id})
+
+
+async def _tombstone_stale_uploads():
+    cutoff = datetime.utcnow() - UPLOAD_STALE_AFTER
+    stale = db.chats.find(
+        {"status": "uploading", "updated_at": {"$lt": cutoff}, "deleted_at": None}, {"_id": 1}
+    )
+    await tombstone_chats([c["_id"] async for c in stale])
+
+
+async def _claim_next():
+    now = datetime.utcnow()
+    return await db.chats.find_one_and_update(
+        {
+            "deleted_at": {"$type": "date"},
+            "$or": [{"purge_lease": None}, {"purge_lease": {"$lt": now}}],
+        },
+        {"$set": {"purge_lease": now + PURGE_LEASE}},
+        projection={"_id": 1},
+    )
+
+
+async def purge_worker():
+    """
+    Runs for the lifetime of the app, purging tombstoned chats one at a time
+    and sweeping old artifact files every ARTIFACT_SWEEP_INTERVAL.
+    """
+    next_sweep = datetime.utcnow()
+    while True:
+        _wakeup.clear()
+        try:
+            if datetime.utcnow() >= next_sweep:
+                await run_cpu(sweep_artifacts)
+                next_sweep = datetime.utcnow() + ARTIFACT_SWEEP_INTERVAL
+            await _tombstone_stale_uploads()
+            chat = await _claim_next()
+            if chat:
+                await purge_chat(chat["_id"])
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Purge worker error: {e}")
+
+        try:
+            await asyncio.wait_for(_wakeup.wait(), PURGE_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
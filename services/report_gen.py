@@ -1,70 +1,30 @@
 from fpdf import FPDF
 from io import BytesIO
-import matplotlib.pyplot as plt
-import pandas as pd
 from datetime import datetime
 from collections import Counter
+from services.charts import render_chart
+from services.csv_export import iter_report_csv
 
 
 # ----------------------------------------------------------------------
-# 🎨 Helper chart functions
+# 🎨 Helper chart functions (rendered + cached by services.charts)
 # ----------------------------------------------------------------------
 
 def plot_sentiment_pie(sentiments: dict):
     """Generate pie chart for sentiment distribution."""
-    labels = list(sentiments.keys())
-    values = list(sentiments.values())
-
-    fig, ax = plt.subplots(figsize=(4, 4))
-    ax.pie(values, labels=labels, autopct="%1.1f%%", startangle=90)
-    ax.set_title("Sentiment Distribution", fontsize=10)
-    plt.tight_layout()
-
-    img = BytesIO()
-    plt.savefig(img, format="png")
-    plt.close(fig)
-    img.seek(0)
-    return img
+    return render_chart("sentiment_pie", sentiments)
 
 
 def plot_participant_bar(participants: dict):
     """Generate bar chart for participant message counts."""
-    labels = list(participants.keys())
-    values = list(participants.values())
-
-    fig, ax = plt.subplots(figsize=(5, 3))
-    ax.barh(labels, values)
-    ax.set_title("Messages per Participant", fontsize=10)
-    ax.set_xlabel("Message Count")
-    plt.tight_layout()
-
-    img = BytesIO()
-    plt.savefig(img, format="png")
-    plt.close(fig)
-    img.seek(0)
-    return img
+    return render_chart("participant_bar", participants)
 
 
 def plot_emotion_bar(emotions: dict):
     """Generate bar chart for detected emotions (if available)."""
     if not emotions:
         return None
-
-    labels = list(emotions.keys())
-    values = list(emotions.values())
-
-    fig, ax = plt.subplots(figsize=(5, 3))
-    ax.bar(labels, values, color='skyblue')
-    ax.set_title("Emotion Distribution", fontsize=10)
-    ax.set_ylabel("Count")
-    plt.xticks(rotation=30, ha='right')
-    plt.tight_layout()
-
-    img = BytesIO()
-    plt.savefig(img, format="png")
-    plt.close(fig)
-    img.seek(0)
-    return img
+    return render_chart("emotion_bar", emotions)
 
 
 # ----------------------------------------------------------------------
@@ -101,6 +61,9 @@ def generate_pdf(report_doc: dict) -> BytesIO:
         pdf.set_font("Arial", "", 12)
         for i, item in enumerate(action_items, 1):
             pdf.multi_cell(0, 8, f"{i}. {item}")
+        total = report_doc.get("action_item_count", len(action_items))
+        if total > len(action_items):
+            pdf.multi_cell(0, 8, f"({len(action_items)} most recent of {total} action items shown)")
         pdf.ln(8)
 
     # Analytics Overview Title
@@ -152,6 +115,29 @@ def generate_pdf(report_doc: dict) -> BytesIO:
         pdf.multi_cell(0, 8, keywords_str)
         pdf.ln(8)
 
+    # Turn-Taking
+    turn_taking = report_doc.get("turn_taking") or {}
+    if turn_taking.get("reply_latency") or turn_taking.get("transitions"):
+        sessions = turn_taking.get("sessions", {})
+        pdf.set_font("Arial", "B", 14)
+        pdf.cell(0, 10, "Turn-Taking:", ln=True)
+        pdf.set_font("Arial", "", 12)
+        pdf.multi_cell(0, 8, (
+            f"{sessions.get('count', 0)} conversation sessions "
+            f"(split at gaps over {turn_taking.get('session_gap_minutes')} minutes), "
+            f"median {sessions.get('median_messages', 0):.0f} messages and "
+            f"{sessions.get('median_duration_seconds', 0) / 60:.1f} minutes each."
+        ))
+        for r in turn_taking.get("reply_latency", [])[:10]:
+            pdf.cell(0, 8, f"{r['participant']}: median reply {r['median_seconds'] / 60:.1f} min "
+                           f"({r['replies']} replies)", ln=True)
+        transitions = turn_taking.get("transitions", [])[:10]
+        if transitions:
+            pdf.multi_cell(0, 8, "Most frequent replies: " + ", ".join(
+                f"{t['to']} to {t['from']} ({t['count']})" for t in transitions
+            ))
+        pdf.ln(8)
+
     # AI Insights
     pdf.set_font("Arial", "B", 14)
     pdf.cell(0, 10, "AI Insights:", ln=True)
@@ -190,26 +176,6 @@ def generate_pdf(report_doc: dict) -> BytesIO:
 
 def generate_csv(report_doc: dict) -> BytesIO:
     """Export summary and stats as CSV."""
-    output = BytesIO()
-
-    # Flatten data for CSV export
-    summary_data = {
-        "chat_id": report_doc.get("chat_id"),
-        "uploaded_by": report_doc.get("uploaded_by"),
-        "productivity_score": report_doc.get("productivity_score"),
-        "summary": report_doc.get("summary")
-    }
-
-    df_summary = pd.DataFrame([summary_data])
-
-    # Create multiple sheets-like CSV (append sections)
-    df_summary.to_csv(output, index=False)
-    output.write(b"\n\nSpeaker Stats\n")
-    pd.DataFrame.from_dict(report_doc.get("speaker_stats", {}), orient="index", columns=["message_count"]).to_csv(output)
-    output.write(b"\n\nSentiment Stats\n")
-    pd.DataFrame.from_dict(report_doc.get("sentiment_stats", {}), orient="index", columns=["count"]).to_csv(output)
-    output.write(b"\n\nTop Keywords\n")
-    pd.DataFrame(report_doc.get("top_keywords", []), columns=["keyword"]).to_csv(output, index=False)
-
+    output = BytesIO(b"".join(iter_report_csv(report_doc)))
     output.seek(0)
     return output
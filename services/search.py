@@ -0,0 +1,224 @@
+"""
+Per-user inverted index over chat messages.
+
+A message is addressed by (chat_id, seq), seq being its position in the chat
+(assigned at upload). Every upload batch writes one posting block per term to
+db.search_postings: {user, term, chat_id, seqs, tfs}. Terms come from
+keyword_tokens(), the tokenizer behind keyword_extract, plus one
+"sender:<name>" term per message that backs the sender filter.
+
+Ranking runs on the server: one aggregation scores the messages holding every
+query term, applies the page cursor and returns only the top of what is left,
+so no page loads the full postings of its terms.
+
+Deleted chats drop out of results as soon as they are tombstoned; their
+postings are removed by the purge worker.
+"""
+import base64
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+
+from database import db
+from services.message_store import store_for
+from services.nlp import keyword_tokens, normalize_text
+from utils.executor import run_cpu
+
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "20"))
+SEARCH_MAX_PAGE_SIZE = 100
+# Each ranking round aggregates every posting of the query terms. Phrase
+# queries look SEARCH_PHRASE_OVERSCAN rows ahead per round; a page still
+# short after SEARCH_MAX_RANK_ROUNDS is returned partial with a cursor.
+SEARCH_MAX_RANK_ROUNDS = int(os.getenv("SEARCH_MAX_RANK_ROUNDS", "3"))
+SEARCH_PHRASE_OVERSCAN = int(os.getenv("SEARCH_PHRASE_OVERSCAN", "4"))
+SENDER_PREFIX = "sender:"
+RESULT_FIELDS = ("sender", "timestamp", "text")
+
+PHRASE_REGEX = re.compile(r'"([^"]+)"')
+
+
+def sender_term(sender: str) -> str:
+    return SENDER_PREFIX + normalize_text(sender).lower()
+
+
+def build_postings(messages: List[Dict], first_seq: int) -> Dict[str, tuple]:
+    """term -> (seqs, term frequencies) for a batch starting at first_seq."""
+    postings: Dict[str, tuple] = {}
+    for offset, msg in enumerate(messages):
+        counts = Counter(keyword_tokens(msg.get("text") or ""))
+        counts[sender_term(msg.get("sender") or "Unknown")] = 1
+        for term, tf in counts.items():
+            seqs, tfs = postings.setdefault(term, ([], []))
+            seqs.append(first_seq + offset)
+            tfs.append(tf)
+    return postings
+
+
+async def index_messages(user: str, chat_id, messages: List[Dict], first_seq: int):
+    postings = await run_cpu(build_postings, messages, first_seq)
+    docs = [
+        {"user": user, "term": term, "chat_id": chat_id, "seqs": seqs, "tfs": tfs}
+        for term, (seqs, tfs) in postings.items()
+    ]
+    if docs:
+        await db.search_postings.insert_many(docs, ordered=False)
+
+
+async def remove_postings(chat_id, from_seq: int = 0):
+    """Drops the posting blocks of messages at position from_seq and later."""
+    await db.search_postings.delete_many({"chat_id": chat_id, "seqs.0": {"$gte": from_seq}})
+
+
+def parse_query(q: str):
+    """Search terms (deduplicated, in order) and the quoted phrases of a query."""
+    phrases = [normalize_text(p).lower() for p in PHRASE_REGEX.findall(q)]
+    terms = list(dict.fromkeys(keyword_tokens(q)))
+    return terms, [p for p in phrases if p]
+
+
+def encode_cursor(score: float, chat_id, seq: int) -> str:
+    raw = f"{score!r}:{chat_id}:{seq}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    try:
+        score, chat_id, seq = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split(":")
+        return float(score), ObjectId(chat_id), int(seq)
+    except (ValueError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def term_weights(user: str, chat_ids: list, query_terms: List[str],
+                       scored_terms: List[str], total_docs: int) -> Optional[Dict[str, float]]:
+    """idf of each scored term (0 for filter terms); None if a term matches nothing."""
+    cursor = await db.search_postings.aggregate([
+        {"$match": {"user": user, "term": {"$in": query_terms}, "chat_id": {"$in": chat_ids}}},
+        {"$group": {"_id": "$term", "df": {"$sum": {"$size": "$seqs"}}}},
+    ])
+    df = {row["_id"]: row["df"] async for row in cursor}
+    if any(not df.get(t) for t in query_terms):
+        return None
+    return {t: math.log(1 + total_docs / df[t]) if t in scored_terms else 0.0 for t in query_terms}
+
+
+def ranking_pipeline(user: str, chat_ids: list, weights: Dict[str, float],
+                     after: Optional[tuple], size: int) -> list:
+    """
+    Messages containing every weighted term, scored by tf-idf and ordered by
+    (-score, chat_id, seq). The cursor bound is applied before the sort, and
+    $sort + $limit keeps only the top `size` rows in memory.
+    """
+    weight = {"$switch": {
+        "branches": [{"case": {"$eq": ["$term", t]}, "then": w} for t, w in weights.items() if w],
+        "default": 0.0,
+    }} if any(weights.values()) else {"$literal": 0.0}
+    pipeline = [
+        {"$match": {"user": user, "term": {"$in": list(weights)}, "chat_id": {"$in": chat_ids}}},
+        {"$project": {
+            "_id": 0, "chat_id": 1, "weight": weight,
+            "posting": {"$zip": {"inputs": ["$seqs", "$tfs"]}},
+        }},
+        {"$unwind": "$posting"},
+        {"$group": {
+            "_id": {"chat_id": "$chat_id", "seq": {"$arrayElemAt": ["$posting", 0]}},
+            "score": {"$sum": {"$multiply": ["$weight", {"$arrayElemAt": ["$posting", 1]}]}},
+            "terms": {"$sum": 1},
+        }},
+        {"$match": {"terms": len(weights)}},
+        {"$project": {"score": {"$round": ["$score", 6]}}},
+    ]
+    if after:
+        score, chat_id, seq = after
+        pipeline.append({"$match": {"$or": [
+            {"score": {"$lt": score}},
+            {"score": score, "_id.chat_id": {"$gt": chat_id}},
+            {"score": score, "_id.chat_id": chat_id, "_id.seq": {"$gt": seq}},
+        ]}})
+    pipeline += [
+        {"$sort": {"score": -1, "_id.chat_id": 1, "_id.seq": 1}},
+        {"$limit": size},
+    ]
+    return pipeline
+
+
+async def search_messages(user: str, q: str, sender: Optional[str] = None,
+                          limit: int = SEARCH_PAGE_SIZE, cursor: Optional[str] = None) -> Dict:
+    terms, phrases = parse_query(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Query has no searchable terms")
+    limit = max(1, min(limit, SEARCH_MAX_PAGE_SIZE))
+    after = decode_cursor(cursor) if cursor else None
+
+    chats = {
+        c["_id"]: c
+        async for c in db.chats.find(
+            {"uploaded_by": user, "deleted_at": None},
+            {"title": 1, "storage": 1, "message_count": 1},
+        )
+    }
+    query_terms = terms + ([sender_term(sender)] if sender else [])
+    total_docs = sum(c.get("message_count", 0) for c in chats.values())
+    weights = await term_weights(user, list(chats), query_terms, terms, total_docs)
+    if weights is None:
+        return {"results": [], "next_cursor": None}
+
+    # Keyset pagination over (-score, chat_id, seq). One row past the window
+    # tells whether another page exists; rows dropped by the phrase filter
+    # are replaced by ranking on from the last row consumed, for a bounded
+    # number of rounds.
+    results, more, rounds = [], True, 0
+    while more and len(results) < limit and rounds < SEARCH_MAX_RANK_ROUNDS:
+        rounds += 1
+        want = limit - len(results)
+        window = want * SEARCH_PHRASE_OVERSCAN if phrases else want
+        ranked = await db.search_postings.aggregate(
+            ranking_pipeline(user, list(chats), weights, after, window + 1), allowDiskUse=True
+        )
+        rows = await ranked.to_list(length=None)
+        more = len(rows) > window
+        page = rows[:window]
+        matched = await _matching(page, chats, phrases)
+        for i, (row, result) in enumerate(zip(page, matched)):
+            after = (row["score"], row["_id"]["chat_id"], row["_id"]["seq"])
+            if result is None:
+                continue
+            results.append(result)
+            if len(results) == limit:
+                more = more or i < len(page) - 1
+                break
+
+    next_cursor = encode_cursor(*after) if more else None
+    return {"results": results, "next_cursor": next_cursor}
+
+
+async def _matching(rows: list, chats: Dict, phrases: List[str]) -> list:
+    """Fetches ranked rows' messages: per row, its result or None if it has no match."""
+    by_chat: Dict = {}
+    for row in rows:
+        by_chat.setdefault(row["_id"]["chat_id"], []).append(row["_id"]["seq"])
+    fetched = {
+        chat_id: await store_for(chats[chat_id]).fetch(chat_id, seqs, RESULT_FIELDS)
+        for chat_id, seqs in by_chat.items()
+    }
+    results = []
+    for row in rows:
+        chat_id, seq = row["_id"]["chat_id"], row["_id"]["seq"]
+        msg = fetched[chat_id].get(seq)
+        if msg is None or any(p not in normalize_text(msg.get("text") or "").lower() for p in phrases):
+            results.append(None)
+            continue
+        results.append({
+            "chat_id": str(chat_id),
+            "chat_title": chats[chat_id].get("title"),
+            "seq": seq,
+            "score": row["score"],
+            **msg,
+        })
+    return results
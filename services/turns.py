@@ -0,0 +1,143 @@
+"""
+Response-latency and turn-taking analytics.
+
+Works on two aligned arrays sorted by time: epoch seconds and integer sender
+codes. A reply is a change of speaker inside a session; sessions are split
+wherever the gap between consecutive messages exceeds SESSION_GAP_MINUTES.
+Everything after array construction is vectorized NumPy.
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import numpy as np
+
+from services.message_store import READ_BATCH_SIZE, store_for
+from utils.executor import run_cpu
+
+SESSION_GAP_MINUTES = int(os.getenv("SESSION_GAP_MINUTES", "30"))
+TOP_TRANSITIONS = 20
+EPOCH = datetime(1970, 1, 1)
+
+
+class SenderTimeline:
+    """Timestamps and sender codes of dated messages, collected batch by batch."""
+
+    def __init__(self):
+        self.names: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self._seconds: List[np.ndarray] = []
+        self._senders: List[np.ndarray] = []
+
+    def _code(self, name: str) -> int:
+        if name not in self._codes:
+            self._codes[name] = len(self.names)
+            self.names.append(name)
+        return self._codes[name]
+
+    def add_many(self, messages: List[Dict]):
+        dated = [m for m in messages if m.get("timestamp")]
+        if not dated:
+            return
+        self._seconds.append(np.array([m["timestamp"] for m in dated], dtype="datetime64[s]").astype(np.int64))
+        names, inverse = np.unique(
+            np.array([m.get("sender") or "Unknown" for m in dated], dtype=object), return_inverse=True
+        )
+        mapping = np.array([self._code(n) for n in names.tolist()], dtype=np.int64)
+        self._senders.append(mapping[inverse])
+
+    def arrays(self):
+        if not self._seconds:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(self._seconds), np.concatenate(self._senders)
+
+    def turn_taking(self, gap_minutes: int = SESSION_GAP_MINUTES) -> Dict:
+        seconds, codes = self.arrays()
+        return turn_taking(seconds, codes, self.names, gap_minutes)
+
+
+def _group_medians(groups: np.ndarray, values: np.ndarray, n: int):
+    """Median of values per group code 0..n-1 (NaN for empty groups) and group sizes."""
+    order = np.lexsort((values, groups))
+    ordered = values[order]
+    counts = np.bincount(groups, minlength=n)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    medians = np.full(n, np.nan)
+    present = counts > 0
+    lo = starts[present] + (counts[present] - 1) // 2
+    hi = starts[present] + counts[present] // 2
+    medians[present] = (ordered[lo] + ordered[hi]) / 2
+    return medians, counts
+
+
+def _as_datetime(seconds) -> datetime:
+    return EPOCH + timedelta(seconds=int(seconds))
+
+
+def turn_taking(seconds: np.ndarray, codes: np.ndarray, names: List[str],
+                gap_minutes: int = SESSION_GAP_MINUTES) -> Dict:
+    n = len(names)
+    result = {
+        "session_gap_minutes": gap_minutes,
+        "reply_latency": [],
+        "transitions": [],
+        "sessions": {"count": 0},
+    }
+    if not len(seconds):
+        return result
+
+    order = np.argsort(seconds, kind="stable")
+    seconds, codes = seconds[order], codes[order]
+
+    gaps = np.diff(seconds)
+    new_session = gaps > gap_minutes * 60
+    reply = (codes[1:] != codes[:-1]) & ~new_session
+    repliers, latencies = codes[1:][reply], gaps[reply]
+
+    # Per-participant median reply latency
+    medians, replies = _group_medians(repliers, latencies, n)
+    result["reply_latency"] = sorted(
+        (
+            {"participant": names[i], "median_seconds": float(medians[i]), "replies": int(replies[i])}
+            for i in np.flatnonzero(replies)
+        ),
+        key=lambda r: r["median_seconds"],
+    )
+
+    # Who replies to whom: (previous speaker -> replier) counts
+    matrix = np.bincount(codes[:-1][reply] * n + repliers, minlength=n * n)
+    top = np.flatnonzero(matrix)
+    top = top[np.argsort(-matrix[top], kind="stable")][:TOP_TRANSITIONS]
+    result["transitions"] = [
+        {"from": names[i // n], "to": names[i % n], "count": int(matrix[i])} for i in top
+    ]
+
+    # Sessions: runs of messages without a gap longer than gap_minutes
+    starts = np.concatenate(([0], np.flatnonzero(new_session) + 1))
+    ends = np.concatenate((starts[1:], [len(seconds)]))
+    sizes = ends - starts
+    durations = seconds[ends - 1] - seconds[starts]
+    longest = int(np.argmax(sizes))
+    result["sessions"] = {
+        "count": int(len(starts)),
+        "median_messages": float(np.median(sizes)),
+        "median_duration_seconds": float(np.median(durations)),
+        "longest": {
+            "start": _as_datetime(seconds[starts[longest]]),
+            "end": _as_datetime(seconds[ends[longest] - 1]),
+            "messages": int(sizes[longest]),
+        },
+    }
+    return result
+
+
+async def chat_turn_taking(chat: dict, gap_minutes: int = SESSION_GAP_MINUTES) -> Dict:
+    """
+    Streams a chat's senders and timestamps and runs the turn-taking stage.
+    Array building and the stage itself run on the CPU executor, never on
+    the event loop.
+    """
+    timeline = SenderTimeline()
+    async for batch in store_for(chat).iter_batches(chat["_id"], ("sender", "timestamp"), READ_BATCH_SIZE):
+        await run_cpu(timeline.add_many, batch)
+    return await run_cpu(timeline.turn_taking, gap_minutes)
@@ -6,6 +6,7 @@ from fastapi.security import OAuth2PasswordBearer
 from database import users_collection
 from dotenv import load_dotenv
 from utils.mongo import fix_mongo
+from utils.cache import TTLCache
 # OAuth2 scheme (used to extract token from Authorization header)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 load_dotenv()
@@ -14,6 +15,17 @@ SECRET_KEY = os.getenv("JWT_SECRET_KEY", "chatinsight_secret")
 REFRESH_SECRET_KEY = os.getenv("JWT_REFRESH_SECRET_KEY", "chatinsight_refresh_secret")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 
+# Sanitized user records keyed by token subject (email), so the common
+# authenticated request skips the Mongo round trip
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+
+def invalidate_user(email: str):
+    """Drop a cached user after logout, token rotation or a profile change."""
+    user_cache.pop(email)
+
 
 # -------------------- JWT CREATION --------------------
 def create_access_token(data: dict, expires_delta: timedelta):
@@ -33,17 +45,20 @@ def create_refresh_token(data: dict, expires_delta: timedelta):
 
 
 # -------------------- VERIFY CURRENT USER --------------------
-def get_current_user(token: str = Depends(oauth2_scheme)):
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email = payload.get("sub", "")
         if not email:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        user = users_collection.find_one({"email": email})
-        if not user:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-        user = fix_mongo(user)
-        user.pop("hashed_password", None)
-        return user
+        user = user_cache.get(email)
+        if user is None:
+            user = await users_collection.find_one({"email": email})
+            if not user:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+            user = fix_mongo(user)
+            user.pop("hashed_password", None)
+            user_cache.set(email, user)
+        return dict(user)
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired or invalid")
\ No newline at end of file
@@ -0,0 +1,143 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from fastapi import HTTPException, status
+
+# CPU-bound work (parsing, NLP, PDF rendering) runs here instead of on the event loop
+CPU_EXECUTOR_WORKERS = int(os.getenv("CPU_EXECUTOR_WORKERS", str(min(4, os.cpu_count() or 1))))
+cpu_executor = ThreadPoolExecutor(max_workers=CPU_EXECUTOR_WORKERS, thread_name_prefix="cpu")
+
+# GIL-bound analytics / report rendering runs in worker processes
+PROCESS_POOL_WORKERS = int(os.getenv("PROCESS_POOL_WORKERS", str(os.cpu_count() or 1)))
+PROCESS_TASK_TIMEOUT = float(os.getenv("PROCESS_TASK_TIMEOUT", "120"))
+
+
+async def run_cpu(fn, *args, **kwargs):
+    """Runs fn(*args, **kwargs) on the CPU executor and awaits the result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_executor, partial(fn, *args, **kwargs))
+
+
+def _warm_worker():
+    # Load VADER, matplotlib (Agg) and fpdf once per worker instead of per task
+    import services.nlp
+    import services.report_gen  # noqa: F401
+    services.nlp.analyze_sentiment("warmup")
+
+
+def _ping():
+    return os.getpid()
+
+
+class ProcessPool:
+    """
+    Lazily started process pool with warmed workers, per-task timeouts and
+    crash recovery. A broken pool is replaced at once; a pool with a hung
+    task stops taking new work and is terminated once its other tasks finish.
+    """
+
+    def __init__(self, workers: int = PROCESS_POOL_WORKERS, timeout: float = PROCESS_TASK_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self.restarts = 0
+        self._pool = None
+        self._lock = threading.Lock()
+        self._slots = None  # asyncio.Semaphore sized to workers, created on first run()
+        self._running: dict = {}  # pool -> in-flight futures
+        self._stuck: dict = {}  # retired pool -> futures that timed out
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_worker,
+                )
+            return self._pool
+
+    def _detach(self, pool: ProcessPoolExecutor) -> bool:
+        """Stops routing new tasks to pool. False if it was already replaced."""
+        with self._lock:
+            if self._pool is not pool:
+                return False
+            self._pool = None
+            self.restarts += 1
+            return True
+
+    def _terminate(self, pool: ProcessPoolExecutor):
+        # Running tasks cannot be cancelled, so hung workers are terminated
+        for proc in list((pool._processes or {}).values()):
+            proc.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+        self._running.pop(pool, None)
+        self._stuck.pop(pool, None)
+
+    def _discard(self, pool: ProcessPoolExecutor):
+        """Replaces a crashed pool; its tasks are lost anyway."""
+        if self._detach(pool):
+            self._terminate(pool)
+
+    def _retire(self, pool: ProcessPoolExecutor, stuck):
+        """Replaces a pool with a hung task without killing its healthy tasks."""
+        first = pool not in self._stuck
+        self._stuck.setdefault(pool, set()).add(stuck)
+        self._detach(pool)
+        if first:
+            asyncio.ensure_future(self._terminate_when_idle(pool))
+
+    async def _terminate_when_idle(self, pool: ProcessPoolExecutor):
+        while True:
+            stuck = self._stuck.get(pool, set())
+            pending = [f for f in self._running.get(pool, ()) if f not in stuck and not f.done()]
+            if not pending:
+                break
+            # Re-checked periodically: a task that times out meanwhile joins `stuck`
+            await asyncio.wait(pending, timeout=1.0, return_when=asyncio.FIRST_COMPLETED)
+        self._terminate(pool)
+
+    async def run(self, fn, *args, timeout: float | None = None):
+        """Runs fn(*args) in a worker process. Retries once if the pool crashed."""
+        loop = asyncio.get_running_loop()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+
+        # At most one task per worker is submitted, so the timeout measures
+        # running time, not time queued behind other requests' tasks
+        async with self._slots:
+            for attempt in range(2):
+                pool = self._get_pool()
+                future = loop.run_in_executor(pool, partial(fn, *args))
+                running = self._running.setdefault(pool, set())
+                running.add(future)
+                future.add_done_callback(running.discard)
+                try:
+                    return await asyncio.wait_for(asyncio.shield(future), timeout or self.timeout)
+                except BrokenProcessPool:
+                    self._discard(pool)
+                    if attempt:
+                        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                            detail="Analysis worker crashed, please retry")
+                except asyncio.TimeoutError:
+                    # Its worker is terminated later; that error has no one to report to
+                    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+                    self._retire(pool, future)
+                    raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                                        detail="Analysis timed out")
+
+    async def warmup(self):
+        """Starts every worker so the first request does not pay the import cost."""
+        await asyncio.gather(*(self.run(_ping) for _ in range(self.workers)))
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+process_pool = ProcessPool()
@@ -0,0 +1,49 @@
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+# Indexes every query path relies on: collection -> [(keys, options)]
+REQUIRED_INDEXES = {
+    "messages": [
+        # Serves every chat_id lookup (analytics, reports, delete, logout cascade)
+        ([("chat_id", ASCENDING), ("timestamp", ASCENDING)], {"name": "chat_id_timestamp"}),
+        # Search results are fetched by position in the chat
+        ([("chat_id", ASCENDING), ("seq", ASCENDING)], {"name": "chat_id_seq"}),
+    ],
+    "message_buckets": [
+        ([("chat_id", ASCENDING), ("_id", ASCENDING)], {"name": "chat_id_id"}),
+        ([("chat_id", ASCENDING), ("first_seq", ASCENDING)], {"name": "chat_id_first_seq"}),
+    ],
+    "search_postings": [
+        ([("user", ASCENDING), ("term", ASCENDING), ("chat_id", ASCENDING)], {"name": "user_term_chat_id"}),
+        # Purge of a deleted chat's postings
+        ([("chat_id", ASCENDING)], {"name": "chat_id"}),
+    ],
+    "chats": [
+        ([("uploaded_by", ASCENDING)], {"name": "uploaded_by"}),
+        ([("uploaded_by", ASCENDING), ("content_hash", ASCENDING)], {"name": "uploaded_by_content_hash"}),
+        # Uploads interrupted without cleanup (swept by the purge worker)
+        ([("status", ASCENDING), ("updated_at", ASCENDING)], {"name": "status_updated_at"}),
+        # Purge queue: only tombstoned chats carry deleted_at
+        ([("deleted_at", ASCENDING)], {"name": "deleted_at", "sparse": True}),
+    ],
+    "users": [
+        ([("email", ASCENDING)], {"name": "email_unique", "unique": True}),
+        ([("email", ASCENDING), ("refresh_token", ASCENDING)], {"name": "email_refresh_token"}),
+    ],
+    "analysis_reports": [
+        ([("chat_id", ASCENDING), ("version", ASCENDING)], {"name": "chat_id_version"}),
+        # Reference checks before an artifact file is deleted
+        ([("artifacts.pdf.digest", ASCENDING)], {"name": "artifacts_pdf_digest", "sparse": True}),
+        ([("artifacts.csv.digest", ASCENDING)], {"name": "artifacts_csv_digest", "sparse": True}),
+    ],
+}
+
+
+async def ensure_indexes(db):
+    """Creates any missing required indexes. Existing ones are left untouched."""
+    for collection, indexes in REQUIRED_INDEXES.items():
+        for keys, options in indexes:
+            try:
+                await db[collection].create_index(keys, **options)
+            except OperationFailure as e:
+                print(f"⚠️ Could not create index {options['name']} on {collection}: {e}")
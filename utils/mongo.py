@@ -11,3 +11,21 @@ def fix_mongo(obj):
         return {key: fix_mongo(value) for key, value in obj.items()}
 
     return obj
+
+
+async def iter_batches(cursor, size: int):
+    """Yields lists of up to `size` documents from an async cursor."""
+    while True:
+        batch = await cursor.to_list(length=size)
+        if not batch:
+            break
+        yield batch
+
+
+# Mongo field names cannot contain "." or start with "$" (sender names can)
+def escape_key(key: str) -> str:
+    return key.replace(".", "．").replace("$", "＄")
+
+
+def unescape_key(key: str) -> str:
+    return key.replace("．", ".").replace("＄", "$")
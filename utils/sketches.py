@@ -0,0 +1,65 @@
+"""
+Fixed-memory streaming summaries used by the approximate analytics mode.
+"""
+import heapq
+import math
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitters with at most `capacity` counters.
+
+    Each tracked item has an estimated count and an error: the true count lies
+    in [count - error, count], and every error is at most total / capacity.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.total = 0
+        self.counts: dict = {}
+        self.errors: dict = {}
+        self._heap: list = []  # (count, item), stale entries skipped lazily
+
+    def add(self, item, count: int = 1):
+        self.total += count
+        if item in self.counts:
+            self.counts[item] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+        else:
+            floor, evicted = self._pop_min()
+            del self.counts[evicted], self.errors[evicted]
+            self.counts[item] = floor + count
+            self.errors[item] = floor
+        heapq.heappush(self._heap, (self.counts[item], item))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c, i) for i, c in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    def _pop_min(self):
+        while True:
+            count, item = heapq.heappop(self._heap)
+            if self.counts.get(item) == count:
+                return count, item
+
+    @property
+    def error_bound(self) -> float:
+        return self.total / self.capacity
+
+    def top(self, n: int = 10) -> list:
+        """[(item, count, error)] for the n largest estimated counts."""
+        ranked = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:n]
+        return [(item, count, self.errors[item]) for item, count in ranked]
+
+
+def proportion_margin(p: float, sample: int, population: int, z: float = 1.96) -> float:
+    """Half-width of the normal-approximation interval for a sampled proportion."""
+    if not sample or sample >= population:
+        return 0.0
+    fpc = (population - sample) / (population - 1)
+    return z * math.sqrt(p * (1 - p) / sample * fpc)
@@ -0,0 +1,59 @@
+import asyncio
+import os
+import time
+from database import db
+from utils.indexes import ensure_indexes
+from utils.executor import run_cpu, process_pool
+
+# Backoff between retries of a failed warmup step (seconds)
+WARMUP_RETRY_INITIAL = float(os.getenv("WARMUP_RETRY_INITIAL", "1"))
+WARMUP_RETRY_MAX = float(os.getenv("WARMUP_RETRY_MAX", "30"))
+
+# Readiness state reported by GET /ready
+readiness = {"ready": False, "steps": {}, "errors": {}, "duration_s": None}
+
+
+def _warm_nlp():
+    from services.nlp import get_analyzer
+    get_analyzer()
+
+
+# (name, coroutine factory) in the order they run
+WARMUP_STEPS = [
+    ("mongo", lambda: db.command("ping")),
+    ("indexes", lambda: ensure_indexes(db)),
+    ("nlp", lambda: run_cpu(_warm_nlp)),
+    ("process_pool", lambda: process_pool.warmup()),
+]
+
+
+async def _run_step(name: str, step):
+    """Runs one warmup step, retrying with exponential backoff until it succeeds."""
+    delay = WARMUP_RETRY_INITIAL
+    while True:
+        step_started = time.perf_counter()
+        try:
+            await step()
+        except Exception as e:
+            readiness["errors"][name] = str(e)
+            print(f"⚠️ Warmup step {name} failed, retrying in {delay:.0f}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WARMUP_RETRY_MAX)
+            continue
+        readiness["errors"].pop(name, None)
+        readiness["steps"][name] = round(time.perf_counter() - step_started, 3)
+        return
+
+
+async def warm_up():
+    """
+    Connects to Mongo and loads models in the background after the app starts
+    serving. Failed steps are retried, so a brief outage at boot only delays
+    readiness instead of leaving /ready at 503 for the life of the process.
+    """
+    started = time.perf_counter()
+    for name, step in WARMUP_STEPS:
+        await _run_step(name, step)
+
+    readiness["duration_s"] = round(time.perf_counter() - started, 3)
+    readiness["ready"] = True